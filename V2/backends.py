@@ -0,0 +1,176 @@
+import os
+import shutil
+import threading
+
+import numpy as np
+
+# "auto" tries the fastest CPU runtimes first; PyTorch is always the last resort
+BACKEND_ORDER = ("openvino", "onnx", "torch")
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_cache")
+OCR_INPUT_SHAPE = (64, 256, 3)
+
+
+def backend_candidates(backend):
+    if backend == "auto":
+        return list(BACKEND_ORDER)
+    if backend not in BACKEND_ORDER:
+        raise ValueError(f"unknown inference backend: {backend}")
+    return [backend] if backend == "torch" else [backend, "torch"]
+
+
+def _is_fresh(export_path, source_path):
+    # An export is reused until the source model file changes
+    if not os.path.exists(export_path):
+        return False
+    if not os.path.exists(source_path):
+        return True
+    return os.path.getmtime(export_path) >= os.path.getmtime(source_path)
+
+
+def _require_runtime(backend):
+    # Fail fast (and fall back) instead of letting ultralytics try to pip
+    # install the runtime on a shop PC
+    if backend == "onnx":
+        import onnxruntime  # noqa: F401
+    elif backend == "openvino":
+        import openvino  # noqa: F401
+
+
+# ==== DETECTOR ====
+def _detector_export_path(model_path, backend):
+    # Exported with dynamic input shapes, so ROI passes can run at a
+    # smaller imgsz than the full frame
+    stem, _ = os.path.splitext(model_path)
+    if backend == "onnx":
+        return stem + "_dynamic.onnx"
+    return stem + "_dynamic_openvino_model"
+
+
+def load_detector(model_path, backend):
+    from ultralytics import YOLO
+
+    if backend == "torch":
+        return YOLO(model_path)
+    _require_runtime(backend)
+    exported = _detector_export_path(model_path, backend)
+    if not _is_fresh(exported, model_path):
+        produced = YOLO(model_path).export(format=backend, dynamic=True)
+        if os.path.isdir(exported):
+            shutil.rmtree(exported)
+        os.replace(produced, exported)
+    # Exported YOLO models return the same Results objects as the .pt one
+    return YOLO(exported, task="detect")
+
+
+# ==== OCR ====
+class HezarOcr:
+    """hezar OCR model on PyTorch.
+
+    predict() is hezar's own path (PIL-based preprocessing per image);
+    predict_crops() preprocesses a whole batch of crops into a reused
+    buffer with CropPreprocessor and runs predict_pixels() on it.
+    """
+
+    def __init__(self, model):
+        from preprocess import CropPreprocessor
+
+        self.model = model
+        self.crop_preprocessor = CropPreprocessor.from_hezar(model)
+        self.lock = threading.Lock()
+
+    def predict(self, images):
+        return self.model.predict(images)
+
+    def predict_pixels(self, pixels):
+        import torch
+
+        with torch.inference_mode():
+            outputs = self.model(torch.from_numpy(pixels))
+        return self.model.post_process(outputs)
+
+    def predict_crops(self, crops):
+        # One batch at a time: the pixel buffer is reused by the next call
+        with self.lock:
+            return self.predict_pixels(self.crop_preprocessor(crops))
+
+
+class ExportedOcr(HezarOcr):
+    """hezar OCR model with its forward pass running from an ONNX graph.
+
+    Post-processing still goes through the hezar model, so predict()
+    returns exactly what Model.predict() would.
+    """
+
+    def __init__(self, model, onnx_path, backend):
+        super().__init__(model)
+        self.backend = backend
+        if backend == "onnx":
+            import onnxruntime as ort
+            session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+            self._run = lambda pixels: session.run(None, {"pixel_values": pixels})[0]
+        else:
+            import openvino as ov
+            compiled = ov.Core().compile_model(onnx_path, "CPU")
+            self._run = lambda pixels: compiled(pixels)[0]
+
+    def predict(self, images):
+        pixels = self.model.preprocess(images)["pixel_values"]
+        return self.predict_pixels(pixels.cpu().numpy().astype(np.float32))
+
+    def predict_pixels(self, pixels):
+        import torch
+
+        logits = self._run(pixels)
+        return self.model.post_process({"logits": torch.from_numpy(np.asarray(logits))})
+
+
+def _ocr_export_path(ocr_name):
+    return os.path.join(CACHE_DIR, ocr_name.replace("/", "__") + ".onnx")
+
+
+def export_ocr(model, path):
+    import torch
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, pixel_values):
+            return self.inner(pixel_values)["logits"]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    model.eval()
+    dummy = model.preprocess([np.zeros(OCR_INPUT_SHAPE, np.uint8)])["pixel_values"]
+    torch.onnx.export(
+        LogitsOnly(model), (dummy,), path,
+        input_names=["pixel_values"], output_names=["logits"],
+        dynamic_axes={"pixel_values": {0: "batch"}},
+        opset_version=17,
+    )
+
+
+def load_ocr(ocr_name, backend):
+    from hezar.models import Model
+
+    model = Model.load(ocr_name)
+    if backend == "torch":
+        model.eval()
+        return HezarOcr(model)
+    _require_runtime(backend)
+    # The ONNX graph is shared: OpenVINO compiles it directly
+    path = _ocr_export_path(ocr_name)
+    if not os.path.exists(path):
+        export_ocr(model, path)
+    return ExportedOcr(model, path, backend)
+
+
+def load_with_fallback(loader, name, backend):
+    # Returns (model, backend actually used); re-raises only if PyTorch fails too
+    for candidate in backend_candidates(backend):
+        try:
+            return loader(name, candidate), candidate
+        except Exception as e:
+            if candidate == "torch":
+                raise
+            print(f"{candidate} backend unavailable for {name}: {e}")
@@ -0,0 +1,239 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+from config import MODEL_PATH, OCR_MODEL, INFERENCE_BACKEND, DETECTION_CONF
+from consensus import PlateVoter
+from metrics import METRICS
+from model_loader import ModelLoader
+from plates import normalize_plate
+from recognition import FrameRecognizer
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+STAGES = ("detect", "crop", "ocr")
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def rss_mb():
+    # Current resident memory; None when it can't be measured here
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2**20
+    return None
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def summarize(samples):
+    ms = np.asarray(samples) * 1000
+    if not ms.size:
+        return {"count": 0}
+    return {
+        "count": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def load_labels(path):
+    # CSV with "name,plate" rows; name is the image or video file name
+    if not path:
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row[0].strip(): row[1].strip() for row in csv.reader(f) if len(row) >= 2}
+
+
+def pipeline_stats(counters):
+    # What the scheduler, ROI planner and OCR cache saved
+    hits = counters.get("ocr_cache_hits", 0)
+    misses = counters.get("ocr_cache_misses", 0)
+    return {
+        "frames_skipped": counters.get("frames_skipped", 0),
+        "detect_roi": counters.get("detect_roi", 0),
+        "detect_full_frame": counters.get("detect_full_frame", 0),
+        "ocr_cache_hits": hits,
+        "ocr_cache_misses": misses,
+        "ocr_cache_hit_rate": hits / (hits + misses) if hits + misses else None,
+    }
+
+
+def plate_matches(predicted, expected):
+    return predicted is not None and normalize_plate(predicted) == normalize_plate(expected)
+
+
+def iter_video(path, max_frames):
+    cap = cv2.VideoCapture(path)
+    try:
+        count = 0
+        while max_frames is None or count < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            count += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+class Benchmark:
+    """Replays frames through FrameRecognizer, the scan path's own
+    schedule -> detect -> track -> OCR-cache loop, one recognizer per item.
+
+    A stage's sample is the time it took in a frame where it ran at all,
+    so skipped frames and cache hits show up as fewer samples, not zeros.
+    """
+
+    def __init__(self, detector, ocr, conf=DETECTION_CONF, scheduler=True, roi=True):
+        self.detector = detector
+        self.ocr = ocr
+        self.conf = conf
+        self.scheduler = scheduler
+        self.roi = roi
+        self.timings = defaultdict(list)
+        self.frames = 0
+        self.plates = 0
+        self.peak_rss = 0.0
+
+    def run_frame(self, recognizer, frame, voter):
+        before = {stage: METRICS.total(stage) for stage in STAGES}
+        t0 = time.perf_counter()
+        reads = recognizer.process(frame)
+        self.timings["frame"].append(time.perf_counter() - t0)
+        for stage in STAGES:
+            spent = METRICS.total(stage) - before[stage]
+            if spent:
+                self.timings[stage].append(spent)
+        self.frames += 1
+        self.plates += len(reads)
+        for read in reads:
+            if not read.cached:
+                voter.add(read.text, read.det_conf)
+        rss = rss_mb()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+
+    def run_item(self, frames):
+        recognizer = FrameRecognizer(self.detector, self.ocr, self.conf, self.scheduler, self.roi)
+        voter = PlateVoter()
+        for frame in frames:
+            self.run_frame(recognizer, frame, voter)
+        return voter.best()
+
+
+def collect_items(videos, image_dirs, max_frames):
+    # (name, frame iterator) for every video and every image
+    for path in videos:
+        yield os.path.basename(path), iter_video(path, max_frames)
+    for directory in image_dirs:
+        for fname in sorted(os.listdir(directory)):
+            if fname.lower().endswith(IMAGE_EXTENSIONS):
+                frame = cv2.imread(os.path.join(directory, fname))
+                if frame is not None:
+                    yield fname, [frame]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay videos/images through plate recognition and time it.")
+    parser.add_argument("--videos", nargs="*", default=[])
+    parser.add_argument("--images", nargs="*", default=[], help="directories of plate images")
+    parser.add_argument("--labels", help="CSV of name,plate for accuracy")
+    parser.add_argument("--backend", default=INFERENCE_BACKEND)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--max-frames", type=int, help="per video")
+    parser.add_argument("--no-scheduler", action="store_true", help="detect on every frame")
+    parser.add_argument("--no-roi", action="store_true", help="always detect on the full frame")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    if not args.videos and not args.images:
+        parser.error("give at least one of --videos / --images")
+
+    loader = ModelLoader(args.model, OCR_MODEL, args.backend)
+    loader.run()  # load + warm up on this thread
+    if loader.error is not None:
+        raise SystemExit(f"model loading failed: {loader.error}")
+
+    labels = load_labels(args.labels)
+    bench = Benchmark(loader.detector, loader.ocr, scheduler=not args.no_scheduler, roi=not args.no_roi)
+    items = []
+    start = time.perf_counter()
+    for name, frames in collect_items(args.videos, args.images, args.max_frames):
+        predicted, confidence = bench.run_item(frames)
+        item = {"name": name, "predicted": predicted, "confidence": confidence}
+        if name in labels:
+            item["expected"] = labels[name]
+            item["correct"] = plate_matches(predicted, labels[name])
+        items.append(item)
+    elapsed = time.perf_counter() - start
+
+    labelled = [item for item in items if "expected" in item]
+    correct = sum(item["correct"] for item in labelled)
+    results = {
+        "config": {
+            "backends": loader.backends,
+            "model": args.model,
+            "conf": bench.conf,
+            "scheduler": bench.scheduler,
+            "roi": bench.roi,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "model_load_seconds": loader.load_seconds,
+        "frames": bench.frames,
+        "plates": bench.plates,
+        "seconds": elapsed,
+        "fps": bench.frames / elapsed if elapsed else 0.0,
+        "peak_rss_mb": max(bench.peak_rss, peak_rss_mb() or 0.0) or None,
+        "stages": {stage: summarize(samples) for stage, samples in bench.timings.items()},
+        "pipeline": pipeline_stats(METRICS.snapshot()["counters"]),
+        "counters": METRICS.snapshot()["counters"],
+        "accuracy": {
+            "labelled": len(labelled),
+            "correct": correct,
+            "accuracy": correct / len(labelled) if labelled else None,
+        },
+        "items": items,
+    }
+
+    print(f"backends: {loader.backends}  frames: {bench.frames}  fps: {results['fps']:.1f}")
+    for stage, stats in results["stages"].items():
+        if stats["count"]:
+            print(f"  {stage:<7} p50 {stats['p50_ms']:7.1f} ms  p90 {stats['p90_ms']:7.1f} ms  "
+                  f"p99 {stats['p99_ms']:7.1f} ms  (n={stats['count']})")
+    pipeline = results["pipeline"]
+    lookups = pipeline["ocr_cache_hits"] + pipeline["ocr_cache_misses"]
+    print(f"  skipped {pipeline['frames_skipped']}/{bench.frames} frames, "
+          f"ROI detections {pipeline['detect_roi']}, OCR cache hits {pipeline['ocr_cache_hits']}/{lookups}")
+    if labelled:
+        print(f"accuracy: {correct}/{len(labelled)} = {correct / len(labelled):.1%}")
+    if results["peak_rss_mb"]:
+        print(f"peak memory: {results['peak_rss_mb']:.0f} MB")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+import platform
+
+# ==== MODELS ====
+# Shared by the GUI and the headless tools (multi-camera, benchmark, ...)
+MODEL_PATH = os.environ.get(
+    "LPR_MODEL_PATH",
+    "D:/Projects/Python/License_detection_mechanicshop/persian-ALPR-main/lp_detector.pt",
+)
+OCR_MODEL  = "hezarai/crnn-fa-64x256-license-plate-recognition"
+# "auto", "openvino", "onnx" or "torch"; anything but torch falls back to it
+INFERENCE_BACKEND = os.environ.get("LPR_BACKEND", "auto")
+DETECTION_CONF    = 0.4
+
+# ==== METRICS ====
+# Optional JSON dump of the scan-path metrics and a Prometheus-style
+# /metrics endpoint on localhost; both off unless configured
+METRICS_FILE = os.environ.get("LPR_METRICS_FILE")
+METRICS_PORT = int(os.environ.get("LPR_METRICS_PORT", "0"))
+METRICS_DUMP_SECONDS = 60
+
+# ==== DATABASE ====
+# "sqlserver" (local MechanicShopDB), "sqlserver:<odbc connection string>"
+# or "sqlite:<file>" to run without a SQL Server instance
+DATABASE_URL = os.environ.get("LPR_DB", "sqlserver")
+DB_POOL_SIZE = 4
+# Worker threads for GUI database calls, and how long the GUI waits for one
+DB_WORKERS = 2
+DB_TIMEOUT_SECONDS = 15
+# plate -> customer cache in front of the customers table
+CUSTOMER_CACHE_SIZE = 2048
+CUSTOMER_CACHE_TTL  = 300.0
+
+# ==== SERVICES ====
+# Service intervals (km only now); used by the history dialog and the
+# fleet due-service report
+SERVICE_INTERVALS = {
+    "روغن موتور": {"km": 5000},
+    "روغن ترمز": {"km": 20000},
+    "روغن گیربکس": {"km": 40000},
+    "لنت ترمز": {"km": 30000},
+    "فیلتر روغن": {"km": 5000},
+    "فیلتر هوا": {"km": 10000},
+    "فیلتر کابین": {"km": 15000},
+    "فیلتر بنزین": {"km": 20000},
+    "ضد یخ": {"km": 15000},
+    "شمع موتور": {"km": 20000},
+}
+# Report: "due" this many km before the interval is reached; vehicles with
+# too little history are assumed to drive DEFAULT_DAILY_KM
+DUE_SOON_KM      = 1000
+DEFAULT_DAILY_KM = 40.0
+
+# ==== EVENTS ====
+# Every recognition (GUI scan, gate, service) is logged, write-behind, to
+# the main database or to LPR_EVENT_LOG ("sqlite:<file>") if set
+STATION_ID    = os.environ.get("LPR_STATION_ID", platform.node() or "station")
+EVENT_LOG_URL = os.environ.get("LPR_EVENT_LOG")
+
+# ==== GATE ====
+# Headless gate-camera daemon (gate.py): one arrival per plate per
+# cooldown, recognition capped at GATE_MAX_FPS frames a second
+GATE_SOURCE           = os.environ.get("LPR_GATE_SOURCE", "0")
+GATE_STATION          = os.environ.get("LPR_STATION", "gate")
+GATE_COOLDOWN_SECONDS = 300
+GATE_MAX_FPS          = 8
+
+# ==== SERVICE ====
+# Local HTTP recognition service (service.py), localhost only. Requests
+# beyond SERVICE_MAX_INFLIGHT, or a full batch queue, get 503 + Retry-After.
+SERVICE_PORT         = int(os.environ.get("LPR_SERVICE_PORT", "8765"))
+SERVICE_MAX_INFLIGHT = 8
+SERVICE_QUEUE_SIZE   = 32
+SERVICE_BATCH_SIZE   = 8
+SERVICE_BATCH_WAIT   = 0.01
+SERVICE_TIMEOUT      = 10.0
+SERVICE_MAX_UPLOAD   = 10 * 2**20
@@ -0,0 +1,55 @@
+from collections import defaultdict
+
+
+def char_similarity(a, b):
+    # Fraction of positions that match; plates of different length disagree
+    if len(a) != len(b) or not a:
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class PlateVoter:
+    """Temporal voting over OCR reads of the same scan.
+
+    Every read votes for its text, weighted by the detector confidence.
+    A candidate's score is the weighted agreement of all reads with it
+    (exact reads count fully, near-misses by matching characters), scaled
+    down until it has been read at least `min_votes` times.
+    """
+
+    def __init__(self, min_confidence=0.8, min_votes=3):
+        self.min_confidence = min_confidence
+        self.min_votes = min_votes
+        self.weights = defaultdict(float)
+        self.votes = defaultdict(int)
+        self.total = 0.0
+
+    def add(self, text, det_conf=1.0):
+        text = text.strip()
+        if not text:
+            return
+        weight = max(float(det_conf), 1e-3)
+        self.weights[text] += weight
+        self.votes[text] += 1
+        self.total += weight
+
+    def confidence(self, text):
+        if not self.total:
+            return 0.0
+        agreement = sum(w * char_similarity(text, other) for other, w in self.weights.items())
+        support = min(1.0, self.votes[text] / self.min_votes)
+        return agreement / self.total * support
+
+    def det_conf(self, text):
+        # Mean detector confidence of the reads of `text`
+        return self.weights[text] / self.votes[text] if self.votes.get(text) else 0.0
+
+    def best(self):
+        if not self.weights:
+            return None, 0.0
+        scored = [(self.confidence(text), self.weights[text], text) for text in self.weights]
+        conf, _, text = max(scored)
+        return text, conf
+
+    def decided(self):
+        return self.best()[1] >= self.min_confidence
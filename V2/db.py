@@ -0,0 +1,738 @@
+import argparse
+import csv
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+from jalali import parse_jalali, format_jalali, day_range, month_range
+from metrics import METRICS
+from plates import normalize_plate
+
+SQLSERVER_CONNECTION = (
+    'DRIVER={ODBC Driver 17 for SQL Server};'
+    'SERVER=localhost;'
+    'DATABASE=MechanicShopDB;'
+    'Trusted_Connection=yes;'
+)
+
+Customer = namedtuple("Customer", "id name phone plate km car_model")
+
+
+# ==== CONNECTION POOL ====
+class ConnectionPool:
+    """A fixed number of connections handed out to one thread at a time.
+
+    Neither pyodbc nor sqlite3 connections may be used by two threads at
+    once; borrowing through the pool makes the repositories safe to call
+    from GUI callbacks and worker threads alike.
+    """
+
+    def __init__(self, connect, dialect, size=4, timeout=10.0):
+        self.connect = connect
+        self.dialect = dialect
+        self.size = size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            grow = self.created < self.size
+            if grow:
+                self.created += 1
+        if grow:
+            try:
+                return self.connect()
+            except Exception:
+                with self.lock:
+                    self.created -= 1
+                raise
+        try:
+            return self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError("no database connection available") from None
+
+    def release(self, conn):
+        self.idle.put(conn)
+
+    def discard(self, conn):
+        with self.lock:
+            self.created -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        healthy = True
+        try:
+            yield conn
+        except BaseException:
+            # Includes GeneratorExit from a caller that stopped iterating
+            # early: the connection must go back to the pool either way
+            try:
+                conn.rollback()
+            except Exception:
+                # Broken connection: don't hand it out again
+                healthy = False
+            raise
+        finally:
+            if healthy:
+                self.release(conn)
+            else:
+                self.discard(conn)
+
+    @contextmanager
+    def transaction(self):
+        # A cursor whose statements commit together, or not at all
+        with self.connection() as conn:
+            cur = conn.cursor()
+            try:
+                if self.dialect == "sqlite":
+                    # Explicit, so DDL is inside the transaction too
+                    cur.execute("BEGIN")
+                yield cur
+                conn.commit()
+            finally:
+                cur.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self.discard(self.idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def connect_sqlserver(connection_string=SQLSERVER_CONNECTION):
+    import pyodbc
+    return pyodbc.connect(connection_string)
+
+
+# SQLite has no datetime type: store ISO text, which sorts and compares
+# like the datetime, and read DATETIME columns back as datetime
+sqlite3.register_adapter(datetime, lambda dt: dt.isoformat(" "))
+sqlite3.register_converter("DATETIME", lambda raw: datetime.fromisoformat(raw.decode()))
+
+
+def connect_sqlite(path):
+    # Pooled connections move between threads, one at a time. No implicit
+    # transactions: sqlite3 would only open them before DML and let DDL
+    # autocommit, so transaction() issues its own BEGIN.
+    return sqlite3.connect(path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES,
+                           isolation_level=None)
+
+
+def open_pool(url, size=4):
+    # "sqlserver", "sqlserver:<odbc connection string>" or "sqlite:<file>"
+    kind, _, target = url.partition(":")
+    if kind == "sqlserver":
+        return ConnectionPool(lambda: connect_sqlserver(target or SQLSERVER_CONNECTION), "sqlserver", size)
+    if kind == "sqlite":
+        return ConnectionPool(lambda: connect_sqlite(target or "mechanicshop.db"), "sqlite", size)
+    raise ValueError(f"unknown database: {url}")
+
+
+# ==== SCHEMA ====
+SCHEMA = {
+    "sqlserver": [
+        """
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='customers' AND xtype='U')
+CREATE TABLE customers (
+    id         INT IDENTITY(1,1) PRIMARY KEY,
+    name       NVARCHAR(128),
+    phone      NVARCHAR(32),
+    plate      NVARCHAR(32),
+    car_model  NVARCHAR(32),
+    km         INT,
+    created_at VARCHAR(50)
+)
+""",
+        """
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='services' AND xtype='U')
+CREATE TABLE services (
+    id           INT IDENTITY(1,1) PRIMARY KEY,
+    customer_id  INT,
+    service_name NVARCHAR(64),
+    km           INT,
+    description  NVARCHAR(256),
+    date         VARCHAR(50)
+)
+""",
+    ],
+    "sqlite": [
+        """
+CREATE TABLE IF NOT EXISTS customers (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    name       TEXT,
+    phone      TEXT,
+    plate      TEXT,
+    car_model  TEXT,
+    km         INTEGER,
+    created_at TEXT
+)
+""",
+        """
+CREATE TABLE IF NOT EXISTS services (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_id  INTEGER,
+    service_name TEXT,
+    km           INTEGER,
+    description  TEXT,
+    date         TEXT
+)
+""",
+    ],
+}
+
+
+SCHEMA_VERSION_TABLE = {
+    "sqlserver": """
+IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='schema_version' AND xtype='U')
+CREATE TABLE schema_version (
+    version    INT PRIMARY KEY,
+    name       NVARCHAR(128)
+)
+""",
+    "sqlite": """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version    INTEGER PRIMARY KEY,
+    name       TEXT
+)
+""",
+}
+BACKFILL_CHUNK = 5000
+
+
+def _create_base_tables(cur, dialect):
+    for statement in SCHEMA[dialect]:
+        cur.execute(statement)
+
+
+def _add_plate_key(cur, dialect):
+    column_type = "NVARCHAR(32)" if dialect == "sqlserver" else "TEXT"
+    cur.execute(f"ALTER TABLE customers ADD plate_key {column_type}")
+    cur.execute("SELECT id, plate FROM customers")
+    rows = cur.fetchall()
+    updates = [(normalize_plate(plate), cid) for cid, plate in rows]
+    for i in range(0, len(updates), BACKFILL_CHUNK):
+        cur.executemany("UPDATE customers SET plate_key=? WHERE id=?", updates[i:i + BACKFILL_CHUNK])
+    cur.execute("CREATE INDEX ix_customers_plate_key ON customers (plate_key, id)")
+    cur.execute("CREATE INDEX ix_services_customer_service_km ON services (customer_id, service_name, km)")
+
+
+def _retype_timestamp(cur, dialect, table, column):
+    # Jalali VARCHAR column -> typed datetime column of the same name
+    column_type = "DATETIME2" if dialect == "sqlserver" else "DATETIME"
+    cur.execute(f"ALTER TABLE {table} ADD {column}_typed {column_type}")
+    cur.execute(f"SELECT id, {column} FROM {table} WHERE {column} IS NOT NULL")
+    rows = cur.fetchall()
+    # Many rows share a timestamp; parse each distinct string once
+    parsed = {text: parse_jalali(text) for text in {text for _, text in rows}}
+    # The old column is dropped below: refuse rather than lose a value.
+    # Raising rolls the whole migration back.
+    bad = [(row_id, text) for row_id, text in rows if text.strip() and parsed[text] is None]
+    if bad:
+        sample = ", ".join(f"id {row_id}: {text!r}" for row_id, text in bad[:5])
+        raise ValueError(f"{len(bad)} {table}.{column} values are not Jalali dates ({sample}); "
+                         f"fix them and run the migration again")
+    updates = [(parsed[text], row_id) for row_id, text in rows]
+    for i in range(0, len(updates), BACKFILL_CHUNK):
+        cur.executemany(f"UPDATE {table} SET {column}_typed=? WHERE id=?", updates[i:i + BACKFILL_CHUNK])
+    cur.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+    if dialect == "sqlserver":
+        cur.execute(f"EXEC sp_rename '{table}.{column}_typed', '{column}', 'COLUMN'")
+    else:
+        cur.execute(f"ALTER TABLE {table} RENAME COLUMN {column}_typed TO {column}")
+
+
+def _typed_timestamps(cur, dialect):
+    _retype_timestamp(cur, dialect, "customers", "created_at")
+    _retype_timestamp(cur, dialect, "services", "date")
+    cur.execute("CREATE INDEX ix_customers_created_at ON customers (created_at)")
+    cur.execute("CREATE INDEX ix_services_date ON services (date)")
+    cur.execute("CREATE INDEX ix_services_customer_date ON services (customer_id, date)")
+
+
+ARRIVALS_TABLE = {
+    "sqlserver": """
+CREATE TABLE arrivals (
+    id          INT IDENTITY(1,1) PRIMARY KEY,
+    station     NVARCHAR(32),
+    plate       NVARCHAR(32),
+    plate_key   NVARCHAR(32),
+    customer_id INT NULL,
+    confidence  FLOAT,
+    seen_at     DATETIME2
+)
+""",
+    "sqlite": """
+CREATE TABLE arrivals (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    station     TEXT,
+    plate       TEXT,
+    plate_key   TEXT,
+    customer_id INTEGER,
+    confidence  REAL,
+    seen_at     DATETIME
+)
+""",
+}
+
+
+def _create_arrivals(cur, dialect):
+    cur.execute(ARRIVALS_TABLE[dialect])
+    cur.execute("CREATE INDEX ix_arrivals_seen_at ON arrivals (seen_at)")
+    cur.execute("CREATE INDEX ix_arrivals_plate_key ON arrivals (plate_key, seen_at)")
+
+
+EVENTS_TABLE = {
+    "sqlserver": """
+CREATE TABLE recognition_events (
+    id          INT IDENTITY(1,1) PRIMARY KEY,
+    station     NVARCHAR(64),
+    source      NVARCHAR(16),
+    plate       NVARCHAR(32) NULL,
+    plate_key   NVARCHAR(32) NULL,
+    det_conf    FLOAT NULL,
+    confidence  FLOAT NULL,
+    customer_id INT NULL,
+    detect_ms   FLOAT NULL,
+    ocr_ms      FLOAT NULL,
+    total_ms    FLOAT NULL,
+    created_at  DATETIME2
+)
+""",
+    "sqlite": """
+CREATE TABLE recognition_events (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    station     TEXT,
+    source      TEXT,
+    plate       TEXT,
+    plate_key   TEXT,
+    det_conf    REAL,
+    confidence  REAL,
+    customer_id INTEGER,
+    detect_ms   REAL,
+    ocr_ms      REAL,
+    total_ms    REAL,
+    created_at  DATETIME
+)
+""",
+}
+
+
+def _create_recognition_events(cur, dialect):
+    cur.execute(EVENTS_TABLE[dialect])
+    cur.execute("CREATE INDEX ix_recognition_events_created_at ON recognition_events (created_at)")
+    cur.execute("CREATE INDEX ix_recognition_events_plate_key ON recognition_events (plate_key, created_at)")
+
+
+# Append-only: each migration runs once, in its own transaction, and is
+# recorded in schema_version. Never edit one that has shipped.
+MIGRATIONS = [
+    (1, "base tables", _create_base_tables),
+    (2, "normalised plate key and lookup indexes", _add_plate_key),
+    (3, "typed, indexed timestamps", _typed_timestamps),
+    (4, "gate arrivals", _create_arrivals),
+    (5, "recognition event log", _create_recognition_events),
+]
+
+
+def migrate(pool):
+    with pool.transaction() as cur:
+        cur.execute(SCHEMA_VERSION_TABLE[pool.dialect])
+        cur.execute("SELECT MAX(version) FROM schema_version")
+        current = cur.fetchone()[0] or 0
+    for version, name, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        with pool.transaction() as cur:
+            apply(cur, pool.dialect)
+            cur.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+        print(f"database migrated to version {version}: {name}")
+
+
+# ==== REPOSITORIES ====
+IMPORT_CHUNK = 1000
+
+# Statements are fixed strings with ? parameters (both drivers use qmark).
+# sqlite3 caches the compiled statements per connection. pyodbc only
+# reuses a prepared statement on the same cursor, and transaction()
+# opens a new one each time, so on SQL Server the fixed text only lets
+# the server reuse its cached plan.
+INSERT_CUSTOMER = {
+    "sqlserver": """
+        INSERT INTO customers (name, phone, plate, plate_key, km, car_model, created_at)
+        OUTPUT INSERTED.id
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+    "sqlite": """
+        INSERT INTO customers (name, phone, plate, plate_key, km, car_model, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+}
+
+
+class CustomerRepository:
+    # plate_key is the normalise_plate() form, so OCR text, typed text and
+    # to_rtl()'d display text all hit the same index entry
+    FIND_BY_PLATE = "SELECT id, name, phone, plate, km, car_model FROM customers WHERE plate_key=? ORDER BY id DESC"
+
+    UPDATE_KM = "UPDATE customers SET km=? WHERE id=? AND (km IS NULL OR km < ?)"
+    ALL_PLATE_KEYS = "SELECT plate_key, MAX(id) FROM customers WHERE plate_key IS NOT NULL GROUP BY plate_key"
+    ADDED_BETWEEN = """
+        SELECT id, name, phone, plate, km, car_model FROM customers
+        WHERE created_at >= ? AND created_at < ?
+        ORDER BY created_at
+    """
+
+    def __init__(self, pool, cache=None):
+        self.pool = pool
+        self.cache = cache
+
+    def find_by_plate(self, plate):
+        key = normalize_plate(plate)
+        if self.cache is not None:
+            customer = self.cache.get(key)
+            if customer is not None:
+                return customer
+        with self.pool.transaction() as cur:
+            cur.execute(self.FIND_BY_PLATE, (key,))
+            row = cur.fetchone()
+        if not row:
+            return None
+        customer = Customer(*row)
+        if self.cache is not None:
+            self.cache.put(key, customer)
+        return customer
+
+    def add(self, name, phone, plate, km, car_model, created_at=None):
+        key = normalize_plate(plate)
+        created_at = created_at or datetime.now()
+        with self.pool.transaction() as cur:
+            cur.execute(INSERT_CUSTOMER[self.pool.dialect],
+                        (name, phone, plate, key, km, car_model, created_at))
+            customer_id = cur.lastrowid if self.pool.dialect == "sqlite" else cur.fetchone()[0]
+        customer = Customer(customer_id, name, phone, plate, km, car_model)
+        if self.cache is not None:
+            # Newest registration wins, same as the ORDER BY id DESC lookup
+            self.cache.put(key, customer)
+        return customer
+
+    def iter_plate_keys(self, chunk=5000):
+        # (plate_key, newest customer id), streamed
+        with self.pool.transaction() as cur:
+            cur.execute(self.ALL_PLATE_KEYS)
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows:
+                    return
+                yield from rows
+
+    def added_between(self, start, end):
+        # Customers registered in [start, end), via ix_customers_created_at
+        with self.pool.transaction() as cur:
+            cur.execute(self.ADDED_BETWEEN, (start, end))
+            return [Customer(*row) for row in cur.fetchall()]
+
+    def remember_odometer(self, customer, km):
+        # Cache side of a committed UPDATE_KM (a serviced car's odometer
+        # only moves forward)
+        if self.cache is not None:
+            km = km if customer.km is None else max(km, customer.km)
+            self.cache.put(normalize_plate(customer.plate), customer._replace(km=km))
+
+
+class ServiceRepository:
+    INSERT = """
+        INSERT INTO services (customer_id, service_name, km, description, date)
+        VALUES (?, ?, ?, ?, ?)
+    """
+    HISTORY_PAGE = {
+        "sqlserver": """
+            SELECT service_name, km, date, description
+            FROM services WHERE customer_id=?
+            ORDER BY date DESC, id DESC
+            OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
+        """,
+        "sqlite": """
+            SELECT service_name, km, date, description
+            FROM services WHERE customer_id=?
+            ORDER BY date DESC, id DESC
+            LIMIT ? OFFSET ?
+        """,
+    }
+    # Highest km per service type and the date it was done, in one grouped
+    # query served by ix_services_customer_service_km
+    LAST_PER_SERVICE = """
+        SELECT s.service_name, s.km, MAX(s.date)
+        FROM services s
+        JOIN (
+            SELECT service_name, MAX(km) AS km
+            FROM services WHERE customer_id=?
+            GROUP BY service_name
+        ) m ON m.service_name = s.service_name AND m.km = s.km
+        WHERE s.customer_id=?
+        GROUP BY s.service_name, s.km
+    """
+    BETWEEN = """
+        SELECT s.date, c.plate, s.service_name, s.km, s.description
+        FROM services s JOIN customers c ON c.id = s.customer_id
+        WHERE s.date >= ? AND s.date < ?
+        ORDER BY s.date
+    """
+
+    def __init__(self, pool, customers):
+        self.pool = pool
+        self.customers = customers
+
+    def _insert_many(self, cur, rows, chunk=IMPORT_CHUNK):
+        # One executemany per chunk; pyodbc sends each chunk to SQL Server
+        # as a single parameter array when fast_executemany is on
+        if hasattr(cur, "fast_executemany"):
+            cur.fast_executemany = True
+        for i in range(0, len(rows), chunk):
+            cur.executemany(self.INSERT, rows[i:i + chunk])
+
+    def register(self, plate, service_names, km, description, date=None):
+        # Customer lookup, all service rows and the odometer update in one
+        # transaction. Returns the customer, or None if the plate is unknown.
+        date = date or datetime.now()
+        with self.pool.transaction() as cur:
+            cur.execute(CustomerRepository.FIND_BY_PLATE, (normalize_plate(plate),))
+            row = cur.fetchone()
+            if not row:
+                return None
+            customer = Customer(*row)
+            self._insert_many(cur, [(customer.id, svc, km, description, date) for svc in service_names])
+            cur.execute(CustomerRepository.UPDATE_KM, (km, customer.id, km))
+        self.customers.remember_odometer(customer, km)
+        return customer
+
+    def import_rows(self, rows):
+        # Bulk load of (customer_id, service_name, km, description, date)
+        with self.pool.transaction() as cur:
+            self._insert_many(cur, rows)
+        return len(rows)
+
+    def import_csv(self, path):
+        # Historical backlog with "plate,service_name,km,description,date"
+        # rows, date in Jalali; rows for unknown plates or unreadable dates
+        # are skipped. Returns (imported, skipped).
+        ids = dict(self.customers.iter_plate_keys())
+        rows, skipped = [], 0
+        with open(path, newline="", encoding="utf-8") as f:
+            for record in csv.reader(f):
+                if len(record) < 5 or not record[2].strip().isdigit():
+                    skipped += 1  # header or malformed line
+                    continue
+                plate, svc, km, desc, dt = (field.strip() for field in record[:5])
+                cid = ids.get(normalize_plate(plate))
+                date = parse_jalali(dt)
+                if cid is None or date is None:
+                    skipped += 1
+                    continue
+                rows.append((cid, svc, int(km), desc, date))
+        return self.import_rows(rows), skipped
+
+    def history_page(self, customer_id, offset=0, limit=20):
+        params = (customer_id, offset, limit) if self.pool.dialect == "sqlserver" else (customer_id, limit, offset)
+        with self.pool.transaction() as cur:
+            cur.execute(self.HISTORY_PAGE[self.pool.dialect], params)
+            return cur.fetchall()
+
+    def last_per_service(self, customer_id):
+        # {service_name: (km, date)}
+        with self.pool.transaction() as cur:
+            cur.execute(self.LAST_PER_SERVICE, (customer_id, customer_id))
+            return {svc: (km, dt) for svc, km, dt in cur.fetchall()}
+
+    def between(self, start, end):
+        # (date, plate, service_name, km, description) in [start, end),
+        # via ix_services_date
+        with self.pool.transaction() as cur:
+            cur.execute(self.BETWEEN, (start, end))
+            return cur.fetchall()
+
+
+class ArrivalRepository:
+    INSERT = """
+        INSERT INTO arrivals (station, plate, plate_key, customer_id, confidence, seen_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    BETWEEN = """
+        SELECT seen_at, station, plate, customer_id, confidence FROM arrivals
+        WHERE seen_at >= ? AND seen_at < ?
+        ORDER BY seen_at
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @staticmethod
+    def row(station, plate, customer_id, confidence, seen_at):
+        # Parameters for INSERT, e.g. to queue on a BatchWriter
+        return (station, plate, normalize_plate(plate), customer_id, confidence, seen_at)
+
+    def between(self, start, end):
+        with self.pool.transaction() as cur:
+            cur.execute(self.BETWEEN, (start, end))
+            return cur.fetchall()
+
+
+class EventRepository:
+    INSERT = """
+        INSERT INTO recognition_events (station, source, plate, plate_key, det_conf, confidence,
+                                        customer_id, detect_ms, ocr_ms, total_ms, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    BETWEEN = """
+        SELECT created_at, station, source, plate, det_conf, confidence, customer_id, total_ms
+        FROM recognition_events
+        WHERE created_at >= ? AND created_at < ?
+        ORDER BY created_at
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @staticmethod
+    def row(station, source, plate, det_conf, confidence, customer_id, timings, created_at):
+        # `plate` is None when nothing was read; timings in ms by stage
+        return (station, source, plate, normalize_plate(plate) if plate else None, det_conf, confidence,
+                customer_id, timings.get("detect_ms"), timings.get("ocr_ms"), timings.get("total_ms"),
+                created_at)
+
+    def between(self, start, end):
+        with self.pool.transaction() as cur:
+            cur.execute(self.BETWEEN, (start, end))
+            return cur.fetchall()
+
+
+# ==== WRITE-BEHIND ====
+WRITE_QUEUE_SIZE    = 10000
+WRITE_BATCH_SIZE    = 200
+WRITE_FLUSH_SECONDS = 2.0
+WRITE_RETRY_SECONDS = 5.0
+
+
+class BatchWriter(threading.Thread):
+    """Write-behind inserts for one statement.
+
+    put() only appends to a bounded in-memory queue; this thread writes
+    whatever has queued up with one executemany per batch, at most
+    `flush_seconds` after a row arrived. If the database is down the batch
+    is retried, and once the queue is full new rows are dropped (and
+    counted as <name>_dropped) instead of blocking the caller or growing
+    memory.
+    """
+
+    def __init__(self, pool, statement, name="rows", batch_size=WRITE_BATCH_SIZE,
+                 flush_seconds=WRITE_FLUSH_SECONDS, max_queued=WRITE_QUEUE_SIZE):
+        super().__init__(daemon=True, name=f"{name}-writer")
+        self.pool = pool
+        self.statement = statement
+        self.metric = name
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.rows = queue.Queue(max_queued)
+        self.stop_event = threading.Event()
+
+    def put(self, row):
+        try:
+            self.rows.put_nowait(row)
+            return True
+        except queue.Full:
+            METRICS.inc(f"{self.metric}_dropped")
+            return False
+
+    def close(self, timeout=10.0):
+        # Flushes what is queued, then stops
+        self.stop_event.set()
+        self.join(timeout)
+
+    def _next_batch(self):
+        try:
+            batch = [self.rows.get(timeout=self.flush_seconds)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not self.stop_event.is_set():
+                    batch.append(self.rows.get(timeout=remaining))
+                else:
+                    batch.append(self.rows.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self.pool.transaction() as cur:
+            if hasattr(cur, "fast_executemany"):
+                cur.fast_executemany = True
+            cur.executemany(self.statement, batch)
+
+    def run(self):
+        while not (self.stop_event.is_set() and self.rows.empty()):
+            batch = self._next_batch()
+            while batch:
+                try:
+                    with METRICS.timer(f"{self.metric}_flush"):
+                        self._write(batch)
+                    METRICS.inc(f"{self.metric}_written", len(batch))
+                    break
+                except Exception as e:
+                    print(f"{self.metric}: writing {len(batch)} rows failed: {e}")
+                    if self.stop_event.is_set():
+                        METRICS.inc(f"{self.metric}_dropped", len(batch))
+                        break
+                    self.stop_event.wait(WRITE_RETRY_SECONDS)
+
+
+def main():
+    from config import DATABASE_URL
+
+    parser = argparse.ArgumentParser(description="Database maintenance for the mechanic shop app.")
+    parser.add_argument("--db", default=DATABASE_URL)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="apply pending schema migrations")
+    imp = sub.add_parser("import-services", help="bulk import a CSV of historical services")
+    imp.add_argument("csv", help="rows of plate,service_name,km,description,date")
+    act = sub.add_parser("activity", help="customers added today and services this month")
+    act.add_argument("--month", action="store_true", help="customers added this month too")
+    args = parser.parse_args()
+
+    pool = open_pool(args.db)
+    migrate(pool)
+    if args.command == "import-services":
+        imported, skipped = ServiceRepository(pool, CustomerRepository(pool)).import_csv(args.csv)
+        print(f"imported {imported} services, skipped {skipped} rows")
+    elif args.command == "activity":
+        customers = CustomerRepository(pool)
+        services = ServiceRepository(pool, customers)
+        added = customers.added_between(*(month_range() if args.month else day_range()))
+        print(f"customers added {'this month' if args.month else 'today'}: {len(added)}")
+        for customer in added:
+            print(f"  {customer.plate}  {customer.name}  {customer.car_model}")
+        done = services.between(*month_range())
+        print(f"services this month: {len(done)}")
+        for dt, plate, svc, km, _ in done:
+            print(f"  {format_jalali(dt)}  {plate}  {svc}  {km} km")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+POLL_MS = 50
+
+
+class DbTask:
+    def __init__(self, future, on_done, on_error, timeout):
+        self.future = future
+        self.on_done = on_done
+        self.on_error = on_error
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.cancelled = False
+
+    def cancel(self):
+        # A queued call never runs; a running one finishes but its result
+        # is dropped
+        self.cancelled = True
+        self.future.cancel()
+
+
+class DbExecutor:
+    """Runs blocking database calls on worker threads.
+
+    Callbacks always run on the Tk thread: completed futures are picked up
+    by an after() poll that only runs while something is pending.
+    `on_busy` is called with True/False when work starts and drains.
+    Every task ends in exactly one callback: a cancelled task gets
+    on_error(CancelledError), a timed-out one on_error(TimeoutError).
+    """
+
+    def __init__(self, root, workers=2, on_busy=None):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self.on_busy = on_busy
+        self.tasks = []
+        self.polling = False
+
+    def submit(self, fn, *args, on_done=None, on_error=None, timeout=None):
+        task = DbTask(self.executor.submit(fn, *args), on_done, on_error, timeout)
+        self.tasks.append(task)
+        if not self.polling:
+            self.polling = True
+            if self.on_busy:
+                self.on_busy(True)
+            self.root.after(POLL_MS, self._poll)
+        return task
+
+    def cancel_all(self, notify=True):
+        for task in self.tasks:
+            if task.cancelled:
+                continue
+            task.cancel()
+            if notify and task.on_error:
+                task.on_error(CancelledError("database call cancelled"))
+
+    def shutdown(self):
+        # The window is gone: nobody left to notify
+        self.cancel_all(notify=False)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _poll(self):
+        now = time.monotonic()
+        pending = []
+        for task in self.tasks:
+            if task.cancelled:
+                continue
+            if task.future.done():
+                self._deliver(task)
+            elif task.deadline is not None and now > task.deadline:
+                task.cancel()
+                if task.on_error:
+                    task.on_error(TimeoutError("database call timed out"))
+            else:
+                pending.append(task)
+        self.tasks = pending
+        if pending:
+            self.root.after(POLL_MS, self._poll)
+            return
+        self.polling = False
+        if self.on_busy:
+            self.on_busy(False)
+
+    def _deliver(self, task):
+        error = task.future.exception()
+        if error is not None:
+            if task.on_error:
+                task.on_error(error)
+            else:
+                print(f"database call failed: {error}")
+        elif task.on_done:
+            task.on_done(task.future.result())
@@ -0,0 +1,59 @@
+import time
+from datetime import datetime
+
+from config import EVENT_LOG_URL, STATION_ID
+from db import open_pool, migrate, BatchWriter, EventRepository
+from metrics import METRICS
+
+STAGES = ("detect", "ocr")
+
+
+class StageTimer:
+    """Detect/OCR time spent since it was created, from the METRICS totals.
+
+    Covers everything the process ran in that time, so it is exact for one
+    scan at a time and an upper bound when several plates overlap.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = {stage: METRICS.total(stage) for stage in STAGES}
+
+    def timings(self):
+        result = {f"{stage}_ms": (METRICS.total(stage) - self.totals[stage]) * 1000 for stage in STAGES}
+        result["total_ms"] = (time.perf_counter() - self.started) * 1000
+        return result
+
+
+class EventLog:
+    """Append-only log of recognitions, written behind the scan path.
+
+    record() only queues a row on a BatchWriter; it never touches the
+    database on the caller's thread.
+    """
+
+    def __init__(self, pool, station=STATION_ID, own_pool=False):
+        self.station = station
+        self.pool = pool if own_pool else None
+        self.writer = BatchWriter(pool, EventRepository.INSERT, "events")
+        self.writer.start()
+
+    def record(self, source, plate, det_conf=None, confidence=None, customer_id=None, timings=None):
+        METRICS.inc("events" if plate else "events_empty")
+        self.writer.put(EventRepository.row(
+            self.station, source, plate or None, det_conf, confidence, customer_id,
+            timings or {}, datetime.now()))
+
+    def close(self):
+        self.writer.close()
+        if self.pool is not None:
+            self.pool.close_all()
+
+
+def open_event_log(pool, url=EVENT_LOG_URL, station=STATION_ID):
+    # The main database's pool unless a separate (e.g. local SQLite) log is configured
+    if not url:
+        return EventLog(pool, station)
+    log_pool = open_pool(url, 1)
+    migrate(log_pool)
+    return EventLog(log_pool, station, own_pool=True)
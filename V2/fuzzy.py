@@ -0,0 +1,96 @@
+import threading
+from collections import defaultdict
+
+from plates import normalize_plate
+
+# Characters the OCR model tends to mix up (dots, small strokes); swapping
+# within a group costs CONFUSION_COST instead of a full edit
+CONFUSABLE_GROUPS = [
+    "بپتثن", "جچحخ", "دذ", "رزژ", "سش", "صض", "طظ", "عغ", "فق", "کگ",
+    "23", "46", "05", "78",
+]
+CONFUSION_COST = 0.5
+EDIT_COST = 1.0
+# Every key is filed under its first and last SEGMENT characters. A single
+# edit can't touch both ends of a normal 8-10 character plate, so one of
+# the two lookups always finds the true plate.
+SEGMENT = 4
+
+_CONFUSABLE = {(a, b) for group in CONFUSABLE_GROUPS for a in group for b in group if a != b}
+
+
+def substitution_cost(a, b):
+    if a == b:
+        return 0.0
+    return CONFUSION_COST if (a, b) in _CONFUSABLE else EDIT_COST
+
+
+def plate_distance(a, b, max_cost=float("inf")):
+    # Weighted Levenshtein; gives up early once every path exceeds max_cost
+    prev = [j * EDIT_COST for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        cur = [i * EDIT_COST]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + EDIT_COST,
+                           cur[j - 1] + EDIT_COST,
+                           prev[j - 1] + substitution_cost(ca, cb)))
+        if min(cur) > max_cost:
+            return float("inf")
+        prev = cur
+    return prev[-1]
+
+
+def confident_match(similar):
+    # The closest (cost, key, customer_id) from search() if it is a lone,
+    # cheap confusion that is safe to load without asking
+    if not similar:
+        return None
+    best_cost = similar[0][0]
+    unique = len(similar) == 1 or similar[1][0] > best_cost
+    return similar[0] if best_cost <= CONFUSION_COST and unique else None
+
+
+class PlateIndex:
+    """In-memory approximate lookup of known plates.
+
+    Candidates come from two small hash buckets (same prefix / same
+    suffix), so a search only scores a handful of plates no matter how
+    many customers there are. Updated incrementally with add().
+    """
+
+    def __init__(self):
+        self.by_prefix = defaultdict(list)
+        self.by_suffix = defaultdict(list)
+        self.customer_ids = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.customer_ids)
+
+    def add(self, plate, customer_id):
+        key = normalize_plate(plate)
+        if not key:
+            return
+        with self.lock:
+            if key not in self.customer_ids:
+                self.by_prefix[key[:SEGMENT]].append(key)
+                self.by_suffix[key[-SEGMENT:]].append(key)
+            # Newest registration wins, same as the exact lookup
+            self.customer_ids[key] = max(customer_id, self.customer_ids.get(key, customer_id))
+
+    def search(self, text, k=3, max_cost=EDIT_COST):
+        # Returns up to k (cost, plate_key, customer_id), closest first
+        query = normalize_plate(text)
+        if not query:
+            return []
+        with self.lock:
+            candidates = set(self.by_prefix.get(query[:SEGMENT], ()))
+            candidates.update(self.by_suffix.get(query[-SEGMENT:], ()))
+            ids = {key: self.customer_ids[key] for key in candidates}
+        scored = []
+        for key, customer_id in ids.items():
+            cost = plate_distance(query, key, max_cost)
+            if cost <= max_cost:
+                scored.append((cost, key, customer_id))
+        scored.sort()
+        return scored[:k]
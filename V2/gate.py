@@ -0,0 +1,252 @@
+import argparse
+import queue
+import signal
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from config import MODEL_PATH, OCR_MODEL, INFERENCE_BACKEND, DETECTION_CONF
+from config import METRICS_FILE, METRICS_PORT, METRICS_DUMP_SECONDS
+from config import DATABASE_URL, DB_POOL_SIZE, CUSTOMER_CACHE_SIZE, CUSTOMER_CACHE_TTL
+from config import GATE_SOURCE, GATE_STATION, GATE_COOLDOWN_SECONDS, GATE_MAX_FPS
+from consensus import PlateVoter
+from db import open_pool, migrate, CustomerRepository, ArrivalRepository, BatchWriter
+from events import open_event_log, StageTimer
+from fuzzy import PlateIndex, confident_match
+from metrics import METRICS
+from multicam import parse_source
+from pipeline import CaptureThread
+from plate_cache import PlateCache
+from plates import normalize_plate
+
+# A track with no read for this long has left; its best read is used if
+# the voter never became sure
+TRACK_TIMEOUT_SECONDS = 3.0
+MIN_ARRIVAL_CONFIDENCE = 0.5
+RECONNECT_SECONDS = 5.0
+INDEX_REFRESH_SECONDS = 600
+FRAME_POLL_SECONDS = 1.0
+
+
+@dataclass
+class TrackVotes:
+    voter: PlateVoter = field(default_factory=PlateVoter)
+    last_read: float = 0.0
+    plate_key: str = None  # set once the arrival has been recorded
+    timer: StageTimer = field(default_factory=StageTimer)
+
+
+class SightingFilter:
+    """Drops repeat sightings of a plate within a cooldown.
+
+    Every sighting refreshes the plate's timestamp, so a car parked in
+    front of the camera is reported once, not once per cooldown.
+    """
+
+    def __init__(self, cooldown):
+        self.cooldown = cooldown
+        self.last_seen = {}
+        self.next_prune = 0.0
+
+    def touch(self, key, now):
+        self.last_seen[key] = now
+
+    def is_new(self, key, now):
+        if now >= self.next_prune:
+            # Keeps the dict the size of the last cooldown's traffic
+            self.last_seen = {k: t for k, t in self.last_seen.items() if now - t < self.cooldown}
+            self.next_prune = now + self.cooldown
+        last = self.last_seen.get(key)
+        self.last_seen[key] = now
+        return last is None or now - last >= self.cooldown
+
+
+class GateDaemon:
+    """Continuous, headless recognition for one gate camera.
+
+    Reads the newest frame, recognises plates, votes per track and writes
+    one arrival per car (with its customer, if known) through a BatchWriter.
+    """
+
+    def __init__(self, source, station, recognizer, customers, writer,
+                 cooldown=GATE_COOLDOWN_SECONDS, max_fps=GATE_MAX_FPS, events=None):
+        self.source = source
+        self.station = station
+        self.recognizer = recognizer
+        self.customers = customers
+        self.writer = writer
+        self.events = events
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.sightings = SightingFilter(cooldown)
+        self.tracks = {}
+        self.plate_index = PlateIndex()
+        self.index_refreshed = 0.0
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        live = isinstance(self.source, int) or "://" in self.source
+        while not self.stop_event.is_set():
+            self._run_capture()
+            if not live:
+                break
+            # Camera dropped out: keep trying until stopped
+            METRICS.inc("gate_reconnects")
+            self.stop_event.wait(RECONNECT_SECONDS)
+        self._finish_tracks(float("inf"))
+
+    def _run_capture(self):
+        frames = queue.Queue(maxsize=1)
+        capture_stop = threading.Event()
+        capture = CaptureThread(self.source, frames, capture_stop)
+        capture.start()
+        try:
+            while not self.stop_event.is_set():
+                started = time.monotonic()
+                if started >= self.index_refreshed + INDEX_REFRESH_SECONDS:
+                    self.index_refreshed = started
+                    threading.Thread(target=self._refresh_index, daemon=True).start()
+                try:
+                    item = frames.get(timeout=FRAME_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    return
+                self.handle(self.recognizer.process(item[1]), time.time())
+                # Bounded CPU: frames arriving faster than max_fps are
+                # overwritten in the one-slot queue while we wait
+                elapsed = time.monotonic() - started
+                if elapsed < self.min_interval:
+                    self.stop_event.wait(self.min_interval - elapsed)
+        finally:
+            capture_stop.set()
+            capture.join(RECONNECT_SECONDS)
+
+    def _refresh_index(self):
+        # Plates registered by the GUI since the last refresh
+        try:
+            for key, cid in self.customers.iter_plate_keys():
+                self.plate_index.add(key, cid)
+        except Exception as e:
+            print(f"plate index refresh failed: {e}")
+
+    def handle(self, reads, now):
+        for read in reads:
+            track = self.tracks.setdefault(read.track_id, TrackVotes())
+            track.last_read = now
+            if track.plate_key is not None:
+                self.sightings.touch(track.plate_key, now)
+                continue
+            # Cached reads repeat an earlier OCR result; they are not votes
+            if read.cached:
+                continue
+            track.voter.add(read.text, read.det_conf)
+            if track.voter.decided():
+                self._arrive(track, now)
+        self._finish_tracks(now)
+
+    def _finish_tracks(self, now):
+        for track_id, track in list(self.tracks.items()):
+            if now - track.last_read < TRACK_TIMEOUT_SECONDS:
+                continue
+            if track.plate_key is None:
+                text, conf = track.voter.best()
+                if conf >= MIN_ARRIVAL_CONFIDENCE:
+                    self._arrive(track, min(now, time.time()))
+                elif text:
+                    # Seen but never read well enough: log it, no arrival
+                    self._record(track, text, conf, None)
+            del self.tracks[track_id]
+
+    def _record(self, track, text, conf, customer_id):
+        if self.events is not None:
+            self.events.record("gate", text, track.voter.det_conf(text), conf, customer_id,
+                               track.timer.timings())
+
+    def _arrive(self, track, now):
+        text, conf = track.voter.best()
+        track.plate_key = normalize_plate(text)
+        if not self.sightings.is_new(track.plate_key, now):
+            METRICS.inc("arrivals_suppressed")
+            self._record(track, text, conf, None)
+            return
+        customer_id = self.match_customer(text)
+        self._record(track, text, conf, customer_id)
+        self.writer.put(ArrivalRepository.row(
+            self.station, text, customer_id, conf, datetime.fromtimestamp(now)))
+        METRICS.inc("arrivals")
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+        print(f"{stamp} [{self.station}] {text} ({conf:.2f}) customer={customer_id}", flush=True)
+
+    def match_customer(self, text):
+        try:
+            customer = self.customers.find_by_plate(text)
+        except Exception as e:
+            print(f"customer lookup failed: {e}")
+            return None
+        if customer:
+            return customer.id
+        match = confident_match(self.plate_index.search(text))
+        return match[2] if match else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless gate camera: record plate arrivals in the database.")
+    parser.add_argument("--source", default=GATE_SOURCE, help="camera index, video file or stream URL")
+    parser.add_argument("--station", default=GATE_STATION)
+    parser.add_argument("--db", default=DATABASE_URL)
+    parser.add_argument("--backend", default=INFERENCE_BACKEND)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--cooldown", type=float, default=GATE_COOLDOWN_SECONDS,
+                        help="seconds before the same plate counts as a new arrival")
+    parser.add_argument("--max-fps", type=float, default=GATE_MAX_FPS)
+    args = parser.parse_args()
+
+    from model_loader import ModelLoader
+    from recognition import FrameRecognizer
+
+    pool = open_pool(args.db, DB_POOL_SIZE)
+    migrate(pool)
+    loader = ModelLoader(args.model, OCR_MODEL, args.backend)
+    loader.run()
+    if loader.error is not None:
+        raise SystemExit(f"model loading failed: {loader.error}")
+
+    writer = BatchWriter(pool, ArrivalRepository.INSERT, "arrivals")
+    writer.start()
+    _, source = parse_source(args.source)
+    daemon = GateDaemon(
+        source, args.station,
+        FrameRecognizer(loader.detector, loader.ocr, DETECTION_CONF),
+        CustomerRepository(pool, PlateCache(CUSTOMER_CACHE_SIZE, CUSTOMER_CACHE_TTL)),
+        writer, args.cooldown, args.max_fps, open_event_log(pool, station=args.station),
+    )
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    if METRICS_PORT:
+        METRICS.serve(METRICS_PORT)
+
+    print(f"gate '{args.station}' watching {source} ({loader.backends})", flush=True)
+    worker = threading.Thread(target=daemon.run, name="gate", daemon=True)
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(METRICS_DUMP_SECONDS)
+            if METRICS_FILE:
+                try:
+                    METRICS.dump(METRICS_FILE)
+                except OSError as e:
+                    print(f"metrics dump failed: {e}")
+    except KeyboardInterrupt:
+        daemon.stop()
+        worker.join()
+    finally:
+        writer.close()
+        daemon.events.close()
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
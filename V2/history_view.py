@@ -0,0 +1,88 @@
+from tkinter import ttk
+
+import customtkinter as ctk
+
+from jalali import format_jalali
+
+# Fetch the next page once the view is scrolled this far down
+PREFETCH_AT = 0.9
+
+
+class HistoryWindow(ctk.CTkToplevel):
+    """Service history of one vehicle in a table, fetched a page at a time.
+
+    Only the rows scrolled into reach are ever loaded: reaching the bottom
+    of the table queues the next page on the DB executor.
+    `load_page(offset, limit)` runs on a worker thread and returns
+    (service_name, km, date, description) rows, newest first.
+    """
+
+    COLUMNS = (
+        ("date", "تاریخ", 150),
+        ("service", "سرویس", 140),
+        ("km", "کیلومتر", 90),
+        ("description", "توضیح", 320),
+    )
+
+    def __init__(self, master, executor, load_page, title, first_page, page_size,
+                 on_error=None, timeout=None):
+        super().__init__(master)
+        self.title(title)
+        self.geometry("760x480")
+        self.executor = executor
+        self.load_page = load_page
+        self.page_size = page_size
+        self.on_error = on_error
+        self.timeout = timeout
+        self.loaded = 0
+        self.loading = False
+        self.exhausted = False
+
+        ttk.Style(self).configure("History.Treeview", font=("B Nazanin", 13), rowheight=26)
+        frame = ctk.CTkFrame(self, fg_color="transparent")
+        frame.pack(fill="both", expand=True, padx=10, pady=(10, 0))
+        self.tree = ttk.Treeview(frame, columns=[c for c, _, _ in self.COLUMNS],
+                                 show="headings", style="History.Treeview")
+        for column, heading, width in self.COLUMNS:
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor="e")
+        self.scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.status = ctk.CTkLabel(self, text="", font=("B Nazanin", 13))
+        self.status.pack(pady=5)
+        self._append(first_page)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= PREFETCH_AT:
+            self._load_more()
+
+    def _load_more(self):
+        if self.loading or self.exhausted:
+            return
+        self.loading = True
+        self.status.configure(text="⏳ در حال دریافت سوابق بیشتر...")
+        self.executor.submit(self.load_page, self.loaded, self.page_size,
+                             on_done=self._append, on_error=self._failed, timeout=self.timeout)
+
+    def _append(self, rows):
+        self.loading = False
+        if not self.winfo_exists():
+            return
+        for svc, km, dt, desc in rows:
+            self.tree.insert("", "end", values=(format_jalali(dt), svc, km, desc or ""))
+        self.loaded += len(rows)
+        self.exhausted = len(rows) < self.page_size
+        more = "" if self.exhausted else " — برای سوابق قدیمی‌تر به پایین بروید"
+        self.status.configure(text=f"{self.loaded} سرویس{more}")
+
+    def _failed(self, error):
+        # Retried on the next scroll
+        self.loading = False
+        if self.winfo_exists():
+            self.status.configure(text="❌ دریافت سوابق ناموفق بود.")
+        if self.on_error:
+            self.on_error(error)
@@ -0,0 +1,46 @@
+from datetime import datetime, time, timedelta
+
+import jdatetime
+
+# Timestamps are stored as Gregorian datetimes; Jalali is for display and
+# for reading old string data only
+JALALI_FORMAT  = "%Y-%m-%d %H:%M:%S"
+JALALI_FORMATS = (JALALI_FORMAT, "%Y-%m-%d %H:%M", "%Y-%m-%d", "%Y/%m/%d")
+
+
+def parse_jalali(text):
+    # Jalali string -> datetime, or None if it isn't one
+    if not text:
+        return None
+    for fmt in JALALI_FORMATS:
+        try:
+            return jdatetime.datetime.strptime(text.strip(), fmt).togregorian()
+        except ValueError:
+            continue
+    return None
+
+
+def format_jalali(dt, fmt=JALALI_FORMAT):
+    if dt is None:
+        return ""
+    if isinstance(dt, str):
+        dt = datetime.fromisoformat(dt)
+    return jdatetime.datetime.fromgregorian(datetime=dt).strftime(fmt)
+
+
+def day_range(now=None):
+    # [start, end) of the current day
+    start = datetime.combine((now or datetime.now()).date(), time.min)
+    return start, start + timedelta(days=1)
+
+
+def month_range(now=None):
+    # [start, end) of the current Jalali month, as Gregorian datetimes
+    today = jdatetime.date.fromgregorian(date=(now or datetime.now()).date())
+    first = jdatetime.date(today.year, today.month, 1)
+    if today.month == 12:
+        following = jdatetime.date(today.year + 1, 1, 1)
+    else:
+        following = jdatetime.date(today.year, today.month + 1, 1)
+    return (datetime.combine(first.togregorian(), time.min),
+            datetime.combine(following.togregorian(), time.min))
@@ -1,84 +1,65 @@
 import cv2
+import threading
 import time
-from ultralytics import YOLO
-from hezar.models import Model
-import pyodbc
+from concurrent.futures import CancelledError
 import customtkinter as ctk
-import jdatetime
 import arabic_reshaper
 from bidi.algorithm import get_display
 from tkinter import simpledialog
-
-tarikhRAW = jdatetime.datetime.now()
-tarikh = str(tarikhRAW.strftime("%Y-%m-%d %H:%M:%S"))
+from pipeline import ScanPipeline
+from consensus import PlateVoter
+from model_loader import ModelLoader
+from config import MODEL_PATH, OCR_MODEL, INFERENCE_BACKEND
+from config import METRICS_FILE, METRICS_PORT, METRICS_DUMP_SECONDS
+from config import DATABASE_URL, DB_POOL_SIZE, CUSTOMER_CACHE_SIZE, CUSTOMER_CACHE_TTL
+from config import DB_WORKERS, DB_TIMEOUT_SECONDS, SERVICE_INTERVALS
+from db import open_pool, migrate, CustomerRepository, ServiceRepository
+from metrics import METRICS
+from db_worker import DbExecutor
+from plate_cache import PlateCache
+from fuzzy import PlateIndex, confident_match
+from history_view import HistoryWindow
+from events import open_event_log, StageTimer
 
 def to_rtl(text: str) -> str:
     reshaped = arabic_reshaper.reshape(text)
     return get_display(reshaped)
 
-# ==== CONFIG & MODELS ====
-MODEL_PATH = "D:/Projects/Python/License_detection_mechanicshop/persian-ALPR-main/lp_detector.pt"
-lp_detector = YOLO(MODEL_PATH)
-lp_ocr      = Model.load("hezarai/crnn-fa-64x256-license-plate-recognition")
-
-# ==== DATABASE SETUP ====
-conn = pyodbc.connect(
-    'DRIVER={ODBC Driver 17 for SQL Server};'
-    'SERVER=localhost;'
-    'DATABASE=MechanicShopDB;'
-    'Trusted_Connection=yes;'
-)
-cursor = conn.cursor()
-
-cursor.execute("""
-IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='customers' AND xtype='U')
-CREATE TABLE customers (
-    id         INT IDENTITY(1,1) PRIMARY KEY,
-    name       NVARCHAR(128),
-    phone      NVARCHAR(32),
-    plate      NVARCHAR(32),
-    car_model  NVARCHAR(32),
-    km         INT,
-    created_at VARCHAR(50)
-)
-""")
-cursor.execute("""
-IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='services' AND xtype='U')
-CREATE TABLE services (
-    id           INT IDENTITY(1,1) PRIMARY KEY,
-    customer_id  INT,
-    service_name NVARCHAR(64),
-    km           INT,
-    description  NVARCHAR(256),
-    date         VARCHAR(50)
-)
-""")
-conn.commit()
+# ==== CONFIG ====
+CAMERA_SOURCE       = 0
+SCAN_MAX_SECONDS    = 5
+SCAN_MIN_CONFIDENCE = 0.8
+SCAN_MIN_VOTES      = 3
+SCAN_POLL_MS        = 30
+
+MODELS_POLL_MS      = 200
+DB_RETRY_SECONDS    = 10
+FUZZY_TOP_K         = 3
+HISTORY_PAGE_SIZE   = 50
+# The status log keeps only the newest lines
+LOG_MAX_LINES       = 500
 
 ctk.set_appearance_mode("light")
 ctk.set_default_color_theme("green")
 
 class MechanicShopApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, pool):
         super().__init__()
-        
+        self.customer_repo = CustomerRepository(pool, PlateCache(CUSTOMER_CACHE_SIZE, CUSTOMER_CACHE_TTL))
+        self.service_repo = ServiceRepository(pool, self.customer_repo)
+        self.events = open_event_log(pool)
+        self.pool = pool
+        # Known plates for near-miss lookups; filled once the database is up
+        self.plate_index = PlateIndex()
+
         self.title("سامانه مدیریت سرویس خودرو 🚗")
         self.geometry("1100x1000")
         self.configure(bg="#F0F5F9")
+        self.scan_pipeline = None
+        self.scan_event = None
 
         # Service intervals (km only now)
-        self.service_intervals = {
-            "روغن موتور": {"km": 5000},
-            "روغن ترمز": {"km": 20000},
-            "روغن گیربکس": {"km": 40000},
-            "لنت ترمز": {"km": 30000},
-            "فیلتر روغن": {"km": 5000},
-            "فیلتر هوا": {"km": 10000},
-            "فیلتر کابین": {"km": 15000},
-            "فیلتر بنزین": {"km": 20000},
-            "ضد یخ": {"km": 15000},
-            "شمع موتور": {"km": 20000},
-        }
+        self.service_intervals = SERVICE_INTERVALS
 
         header = ctk.CTkFrame(self, fg_color="#0000CD", height=90, corner_radius=0)
         header.pack(fill="x")
@@ -191,7 +172,8 @@ class MechanicShopApp(ctk.CTk):
 
         self.scan_btn = ctk.CTkButton(
             left_frame,
-            text="📸 اسکن پلاک (۶ ثانیه)",
+            text="⏳ در حال بارگذاری مدل‌ها...",
+            state="disabled",
             font=("B Nazanin", 16),
             fg_color="#4682B4",
             text_color="white",
@@ -224,6 +206,20 @@ class MechanicShopApp(ctk.CTk):
         self.info_box.pack(padx=10, pady=10, fill="both", expand=True)
         self.info_box.insert("0.0", "هنوز اطلاعاتی وارد نشده است.\n")
 
+        # Shown above the info box while database calls are running
+        self.busy_frame = ctk.CTkFrame(center_frame, fg_color="transparent")
+        self.busy_bar = ctk.CTkProgressBar(self.busy_frame, mode="indeterminate")
+        self.busy_bar.pack(side="left", fill="x", expand=True, padx=(0, 10))
+        ctk.CTkButton(
+            self.busy_frame,
+            text="⏹ لغو",
+            font=("B Nazanin", 14),
+            fg_color="#B22222",
+            width=80,
+            command=self.cancel_db
+        ).pack(side="right")
+        self.db = DbExecutor(self, DB_WORKERS, on_busy=self._set_busy)
+
         descf = ctk.CTkFrame(sf, fg_color="transparent")
         descf.pack(pady=15)
         
@@ -250,11 +246,14 @@ class MechanicShopApp(ctk.CTk):
         button_params = [
             ("➕ ثبت مشتری", "#4CAF50", "#45A049", self.add_customer),
             ("✅ ثبت سرویس", "#2F4F4F", "#1976D2", self.register_service),
-            ("📋 سوابق سرویس", "#B22222", "#7B1FA2", self.show_service_history_with_due)
+            ("📋 سوابق سرویس", "#B22222", "#7B1FA2", self.show_service_history_with_due),
+            ("📊 آمار اسکن", "#4682B4", "#36648B", self.show_metrics)
         ]
 
+        # Everything but the metrics button needs the database
+        self.db_buttons = []
         for i, (text, color, hover, command) in enumerate(button_params):
-            ctk.CTkButton(
+            button = ctk.CTkButton(
                 btnf,
                 text=text,
                 font=("B Nazanin", 16, "bold"),
@@ -263,48 +262,181 @@ class MechanicShopApp(ctk.CTk):
                 height=45,
                 width=180,
                 corner_radius=12,
-                command=command
-            ).grid(row=0, column=i, padx=20)
+                command=command,
+                state="normal" if command == self.show_metrics else "disabled"
+            )
+            button.grid(row=0, column=i, padx=20)
+            if command != self.show_metrics:
+                self.db_buttons.append(button)
+
+        # Connecting and migrating can take a whole ODBC login timeout;
+        # the database buttons unlock when it is done
+        self.db_ready = False
+        self._connect_db()
+
+        # Models load in the background; the scan button unlocks when ready
+        self.models = ModelLoader(MODEL_PATH, OCR_MODEL, INFERENCE_BACKEND)
+        self.models.start()
+        self.after(MODELS_POLL_MS, self._check_models)
+
+        if METRICS_PORT:
+            METRICS.serve(METRICS_PORT)
+        if METRICS_FILE:
+            self.after(METRICS_DUMP_SECONDS * 1000, self._dump_metrics)
+
+    def log(self, message):
+        # Newest first; whatever falls below LOG_MAX_LINES is dropped, so
+        # the textbox stays the same size however long the app runs
+        self.info_box.insert("0.0", message)
+        self.info_box.delete(f"{LOG_MAX_LINES + 1}.0", "end")
+
+    def _dump_metrics(self):
+        try:
+            METRICS.dump(METRICS_FILE)
+        except OSError as e:
+            print(f"metrics dump failed: {e}")
+        self.after(METRICS_DUMP_SECONDS * 1000, self._dump_metrics)
+
+    def show_metrics(self):
+        text = METRICS.format_text() or "هنوز اسکنی انجام نشده است."
+        self.log(f"📊 آمار مراحل اسکن:\n{text}\n\n")
+
+    def _build_plate_index(self):
+        for key, cid in self.customer_repo.iter_plate_keys():
+            self.plate_index.add(key, cid)
+
+    def _connect_db(self):
+        self.db_done = threading.Event()
+        self.db_failure = None
+        threading.Thread(target=self._migrate_db, daemon=True).start()
+        self.after(MODELS_POLL_MS, self._check_db)
+
+    def _migrate_db(self):
+        try:
+            migrate(self.pool)
+        except Exception as e:
+            self.db_failure = e
+        finally:
+            self.db_done.set()
+
+    def _check_db(self):
+        if not self.db_done.is_set():
+            self.after(MODELS_POLL_MS, self._check_db)
+            return
+        if self.db_failure is not None:
+            self.log(f"❌ اتصال به پایگاه داده برقرار نشد: {self.db_failure} — تلاش دوباره تا {DB_RETRY_SECONDS} ثانیه دیگر.\n")
+            self.after(DB_RETRY_SECONDS * 1000, self._connect_db)
+            return
+        self.db_ready = True
+        for button in self.db_buttons:
+            button.configure(state="normal")
+        threading.Thread(target=self._build_plate_index, daemon=True).start()
+        if self.models.ready.is_set() and self.models.error is None:
+            self.scan_btn.configure(text="📸 اسکن پلاک", state="normal")
+        self.log("✅ پایگاه داده آماده است.\n")
+
+    def _check_models(self):
+        if not self.models.ready.is_set():
+            self.after(MODELS_POLL_MS, self._check_models)
+            return
+        if self.models.error is not None:
+            self.scan_btn.configure(text="❌ مدل‌ها بارگذاری نشدند")
+            self.log(f"❌ خطا در بارگذاری مدل‌ها: {self.models.error}\n")
+            return
+        if self.db_ready:
+            self.scan_btn.configure(text="📸 اسکن پلاک", state="normal")
+        else:
+            self.scan_btn.configure(text="⏳ در انتظار پایگاه داده...")
+        backends = ", ".join(f"{k}: {v}" for k, v in self.models.backends.items())
+        self.log(f"✅ مدل‌ها آماده‌اند ({backends} — {self.models.load_seconds:.1f} ثانیه).\n")
 
     def scan_plate(self):
-        self.info_box.insert("0.0", "📸 شروع اسکن پلاک برای ثانیه...\n")
-        cap = cv2.VideoCapture(0)
-        start = time.time()
-        plate_text = None
-
-        while time.time() - start < 5:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            res = lp_detector(frame, conf=0.4)[0]
-            for box in res.boxes.data.tolist():
-                x1, y1, x2, y2, _, _ = map(int, box[:6])
-                crop = frame[y1:y2, x1:x2]
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                txt = lp_ocr.predict(crop)[0]['text'].strip()
-                if txt:
-                    plate_text = txt
-                    print(plate_text)
-
+        if self.scan_pipeline is not None:
+            return
+        self.log("📸 شروع اسکن پلاک برای ثانیه...\n")
+        self.scan_btn.configure(state="disabled")
+        self.scan_voter = PlateVoter(SCAN_MIN_CONFIDENCE, SCAN_MIN_VOTES)
+        self.scan_started = time.time()
+        self.scan_timer = StageTimer()
+        self.scan_pipeline = ScanPipeline(CAMERA_SOURCE, self.models.detector, self.models.ocr)
+        self.scan_pipeline.start()
+        self.after(SCAN_POLL_MS, self._poll_scan)
+
+    def _poll_scan(self):
+        pipeline = self.scan_pipeline
+        for read in pipeline.drain_results():
+            # Cached reads repeat an earlier OCR result; they are not votes
+            if not read.cached:
+                self.scan_voter.add(read.text, read.det_conf)
+
+        frame = pipeline.preview_frame()
+        if frame is not None:
             cv2.imshow("Scan Plate", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+        quit_pressed = cv2.waitKey(1) & 0xFF == ord('q')
+
+        timed_out = time.time() - self.scan_started >= SCAN_MAX_SECONDS
+        if quit_pressed or timed_out or pipeline.finished() or self.scan_voter.decided():
+            pipeline.stop()
+            cv2.destroyAllWindows()
+            self.scan_pipeline = None
+            self._enable_scan_when_stopped(pipeline)
+            plate_text, conf = self.scan_voter.best()
+            self.scan_event = {
+                "det_conf": self.scan_voter.det_conf(plate_text) if plate_text else None,
+                "confidence": conf,
+                "timings": self.scan_timer.timings(),
+            }
+            self.show_scan_result(plate_text)
+            return
+        self.after(SCAN_POLL_MS, self._poll_scan)
 
-        cap.release()
-        cv2.destroyAllWindows()
+    def _enable_scan_when_stopped(self, pipeline):
+        # A worker may still be inside a detector/OCR call
+        if pipeline.running():
+            self.after(SCAN_POLL_MS, self._enable_scan_when_stopped, pipeline)
+            return
+        self.scan_btn.configure(state="normal")
 
+    def show_scan_result(self, plate_text):
         if not plate_text:
-            self.info_box.insert("0.0", "❌ پلاکی یافت نشد.\n")
+            self.log("❌ پلاکی یافت نشد.\n")
+            self._record_scan(None, None)
             return
 
         # Query database for the detected plate
-        cursor.execute("SELECT name, phone, km, car_model FROM customers WHERE plate=?", plate_text)
-        customer = cursor.fetchone()
-
+        self.db.submit(self.lookup_customer, plate_text,
+                       on_done=lambda result: self._show_customer(plate_text, *result),
+                       on_error=lambda error: self._lookup_failed(plate_text, error),
+                       timeout=DB_TIMEOUT_SECONDS)
+
+    def lookup_customer(self, plate_text):
+        # Runs on a DB worker thread
+        with METRICS.timer("customer_lookup"):
+            customer = self.customer_repo.find_by_plate(plate_text)
         if customer:
-            name, phone, km, car_model = customer
-            self.info_box.insert("0.0", f"✅ پلاک {to_rtl(plate_text)} پیدا شد! اطلاعات مشتری بارگذاری شد.\n")
-        
+            return customer, []
+        return self.find_similar_customer(plate_text)
+
+    def _record_scan(self, plate_text, customer_id):
+        # Logged once per scan, after the customer lookup
+        event, self.scan_event = self.scan_event, None
+        if event is not None:
+            self.events.record("scan", plate_text, customer_id=customer_id, **event)
+
+    def _lookup_failed(self, plate_text, error):
+        # Failed, timed out or cancelled: the read still goes in the event log
+        self._record_scan(plate_text, None)
+        self._db_error(error)
+
+    def _show_customer(self, plate_text, customer, similar):
+        self._record_scan(plate_text, customer.id if customer else None)
+        if customer:
+            _, name, phone, plate, km, car_model = customer
+            if similar:
+                self.log(f"✅ پلاک {to_rtl(plate_text)} با پلاک ثبت‌شده {to_rtl(plate)} تطبیق داده شد. اطلاعات مشتری بارگذاری شد.\n")
+            else:
+                self.log(f"✅ پلاک {to_rtl(plate_text)} پیدا شد! اطلاعات مشتری بارگذاری شد.\n")
+
             # Populate the fields
             self.entries[0].delete(0, "end")  # Name field
             self.entries[0].insert(0, name)
@@ -312,6 +444,9 @@ class MechanicShopApp(ctk.CTk):
             self.entries[1].delete(0, "end")  # Phone field
             self.entries[1].insert(0, phone)
 
+            self.entries[2].delete(0, "end")  # Plate field, as registered
+            self.entries[2].insert(0, plate)
+
             self.entries[3].delete(0, "end")  # KM field
             self.entries[3].insert(0, str(km))
 
@@ -323,97 +458,129 @@ class MechanicShopApp(ctk.CTk):
             ent = self.entries[2]
             ent.delete(0, "end")
             ent.insert(0, to_rtl(plate_text))
-            self.info_box.insert("0.0", f"✅ پلاک {to_rtl(plate_text)} شناسایی شد.\n")
+            self.log(f"✅ پلاک {to_rtl(plate_text)} شناسایی شد.\n")
+            if similar:
+                options = "، ".join(to_rtl(key) for _, key, _ in similar)
+                self.log(f"🔎 پلاک‌های مشابه ثبت‌شده: {options}\n")
+
+    def find_similar_customer(self, plate_text):
+        # The exact lookup missed; the OCR may have confused a character.
+        # Load the closest plate only if it is a lone cheap confusion.
+        with METRICS.timer("fuzzy_lookup"):
+            similar = self.plate_index.search(plate_text, FUZZY_TOP_K)
+        match = confident_match(similar)
+        if match:
+            return self.customer_repo.find_by_plate(match[1]), similar
+        return None, similar
+
+    def _db_error(self, error):
+        if isinstance(error, CancelledError):
+            return  # cancel_db() already said so
+        if isinstance(error, TimeoutError):
+            self.log("❌ پایگاه داده پاسخ نداد. دوباره تلاش کنید.\n")
+        else:
+            self.log(f"❌ خطای پایگاه داده: {error}\n")
+
+    def _set_busy(self, busy):
+        if busy:
+            self.busy_frame.pack(before=self.info_box, fill="x", padx=10, pady=(10, 0))
+            self.busy_bar.start()
+        else:
+            self.busy_bar.stop()
+            self.busy_frame.pack_forget()
 
+    def cancel_db(self):
+        self.db.cancel_all()
+        self.log("⏹ عملیات پایگاه داده لغو شد.\n")
 
     def add_customer(self):
         name, phone, plate, km, car_model = [e.get().strip() for e in self.entries]
         if not all((name, phone, plate, km, car_model)):
-            self.info_box.insert("0.0", "❌ لطفاً همه فیلدها را پر کنید.\n")
+            self.log("❌ لطفاً همه فیلدها را پر کنید.\n")
             return
-        now = tarikh
-        cursor.execute("""
-            INSERT INTO customers (name, phone, plate, km, car_model, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        """, name, phone, plate, int(km), now)
-        conn.commit()
-        self.info_box.insert("0.0", f"✅ مشتری {name} ثبت شد.\n")
+        self.db.submit(self.customer_repo.add, name, phone, plate, int(km), car_model,
+                       on_done=self._customer_added, on_error=self._db_error, timeout=DB_TIMEOUT_SECONDS)
+
+    def _customer_added(self, customer):
+        self.plate_index.add(customer.plate, customer.id)
+        self.log(f"✅ مشتری {customer.name} ثبت شد.\n")
 
     def register_service(self):
         selected = [n for n, cb in self.services.items() if cb.get()==1]
         _, _, plate, km, _ = [e.get().strip() for e in self.entries]
         if not selected:
-            self.info_box.insert("0.0", "❌ حداقل یک سرویس را انتخاب کنید.\n")
+            self.log("❌ حداقل یک سرویس را انتخاب کنید.\n")
             return
 
-        cursor.execute("SELECT id FROM customers WHERE plate=? ORDER BY id DESC", plate)
-        row = cursor.fetchone()
-        if not row:
-            self.info_box.insert("0.0", "❌ مشتری یافت نشد! ابتدا ثبتش کنید.\n")
-            return
-        cid = row[0]
-        now = tarikh
         desc = self.desc_entry.get().strip()
-        for svc in selected:
-            cursor.execute("""
-                INSERT INTO services (customer_id, service_name, km, description, date)
-                VALUES (?, ?, ?, ?, ?)
-            """, cid, svc, int(km), desc, now)
-        conn.commit()
-        self.info_box.insert("0.0", f"✅ سرویس برای پلاک {plate} ثبت شد.\n")
+        self.db.submit(self.service_repo.register, plate, selected, int(km), desc,
+                       on_done=lambda customer: self._service_registered(plate, customer),
+                       on_error=self._db_error, timeout=DB_TIMEOUT_SECONDS)
+
+    def _service_registered(self, plate, customer):
+        if not customer:
+            self.log("❌ مشتری یافت نشد! ابتدا ثبتش کنید.\n")
+            return
+        self.log(f"✅ سرویس برای پلاک {plate} ثبت شد.\n")
 
     def show_service_history_with_due(self):
         # Step 1: Get plate
         plate = self.entries[2].get().strip()
         if not plate:
-            self.info_box.insert("0.0", "❌ لطفاً شماره پلاک را وارد کنید.\n")
+            self.log("❌ لطفاً شماره پلاک را وارد کنید.\n")
             return
 
         # Step 2: Find customer
-        cursor.execute("SELECT id FROM customers WHERE plate=? ORDER BY id DESC", plate)
-        row = cursor.fetchone()
-        if not row:
-            self.info_box.insert("0.0", "❌ سابقه‌ای برای این پلاک یافت نشد.\n")
+        self.db.submit(self.customer_repo.find_by_plate, plate,
+                       on_done=lambda customer: self._ask_current_km(plate, customer),
+                       on_error=self._db_error, timeout=DB_TIMEOUT_SECONDS)
+
+    def _ask_current_km(self, plate, customer):
+        if not customer:
+            self.log("❌ سابقه‌ای برای این پلاک یافت نشد.\n")
             return
-        cid = row[0]
 
         # Step 3: Ask for new odometer
         new_km_str = simpledialog.askstring("کیلومتر فعلی", "عدد کیلومتر فعلی را وارد کنید:")
         if new_km_str is None:
-            self.info_box.insert("0.0", "❌ کیلومتر فعلی وارد نشد.\n")
+            self.log("❌ کیلومتر فعلی وارد نشد.\n")
             return
         try:
             new_km = int(new_km_str)
         except:
-            self.info_box.insert("0.0", "❌ لطفاً کیلومتر را به عدد صحیح وارد کنید.\n")
+            self.log("❌ لطفاً کیلومتر را به عدد صحیح وارد کنید.\n")
             return
 
-        # Step 4: Fetch service history
-        cursor.execute("""
-            SELECT service_name, km, date, description
-            FROM services WHERE customer_id=?
-            ORDER BY date DESC
-        """, cid)
-        rows = cursor.fetchall()
+        # Step 4: Fetch the latest page of history and the last service of
+        # each type (computed by the database, not from the full history)
+        self.db.submit(self._load_history, customer.id,
+                       on_done=lambda result: self._show_history(plate, customer.id, new_km, *result),
+                       on_error=self._db_error, timeout=DB_TIMEOUT_SECONDS)
+
+    def _load_history(self, cid):
+        # Runs on a DB worker thread
+        rows = self.service_repo.history_page(cid, 0, HISTORY_PAGE_SIZE)
+        if not rows:
+            return rows, {}
+        return rows, self.service_repo.last_per_service(cid)
+
+    def _show_history(self, plate, cid, new_km, rows, last_service):
         if not rows:
-            self.info_box.insert("0.0", "❌ هیچ سرویسی برای این خودرو ثبت نشده است.\n")
+            self.log("❌ هیچ سرویسی برای این خودرو ثبت نشده است.\n")
             return
 
-        # Step 5: Find last odometer and show history
-        history_lines = []
-        last_service_km = {}
-        last_service_date = {}
-        for svc, km, dt, desc in rows:
-            history_lines.append(f"{dt} — {svc} — {km} کیلومتر\nتوضیح: {desc}\n")
-            # we want the service with the largest (latest) km for each service_name
-            if svc not in last_service_km or km > last_service_km[svc]:
-                last_service_km[svc] = km
-                last_service_date[svc] = dt
+        # Step 5: Show history, one page now and more as the table scrolls
+        HistoryWindow(
+            self, self.db,
+            lambda offset, limit: self.service_repo.history_page(cid, offset, limit),
+            f"📋 سوابق سرویس برای {plate}", rows, HISTORY_PAGE_SIZE,
+            on_error=self._db_error, timeout=DB_TIMEOUT_SECONDS,
+        )
 
         # Step 6: Calculate due services
         due_lines = []
         for svc, interval in self.service_intervals.items():
-            last_km = last_service_km.get(svc, None)
+            last_km = last_service.get(svc, (None, None))[0]
             if last_km is None:
                 due_lines.append(f"🔴 {svc}: هرگز انجام نشده (اولین سرویس)")
             else:
@@ -424,10 +591,12 @@ class MechanicShopApp(ctk.CTk):
                     due_lines.append(f"🟢 {svc}: {interval['km'] - passed_km} کیلومتر تا موعد بعدی باقی مانده است.")
 
         # Step 7: Show
-        text = f"📋 سوابق سرویس برای {plate}:\n" + "".join(history_lines) + "\n"
-        text += "🛠️ سرویس‌هایی که موعدشان رسیده یا نزدیک است:\n" + "\n".join(due_lines)
-        self.info_box.insert("0.0", text + "\n\n")
+        text = f"🛠️ سرویس‌هایی که موعدشان رسیده یا نزدیک است ({plate}):\n" + "\n".join(due_lines)
+        self.log(text + "\n\n")
 
 if __name__ == "__main__":
-    app = MechanicShopApp()
-    app.mainloop()
\ No newline at end of file
+    pool = open_pool(DATABASE_URL, DB_POOL_SIZE)
+    app = MechanicShopApp(pool)
+    app.mainloop()
+    app.db.shutdown()
+    app.events.close()
\ No newline at end of file
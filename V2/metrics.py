@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HISTOGRAM_WINDOW = 1024  # most recent samples kept per timer
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class RollingHistogram:
+    def __init__(self, window=HISTOGRAM_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def snapshot(self):
+        # Quantiles over the recent window; count and sum over the lifetime
+        ordered = sorted(self.samples)
+        stats = {"count": self.count, "sum": self.total}
+        if ordered:
+            for q in QUANTILES:
+                stats[f"p{int(q * 100)}"] = ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            stats["max"] = ordered[-1]
+        return stats
+
+
+class Metrics:
+    """Counters and rolling timing histograms for the recognition path.
+
+    Cheap enough to call per frame: one perf_counter() pair and one locked
+    deque append per timed block.
+    """
+
+    def __init__(self, window=HISTOGRAM_WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.counters = defaultdict(int)
+        self.timings = {}
+
+    def inc(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def observe(self, name, seconds):
+        with self.lock:
+            hist = self.timings.get(name)
+            if hist is None:
+                hist = self.timings[name] = RollingHistogram(self.window)
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def total(self, name):
+        # Lifetime seconds spent in a timer; cheaper than snapshot()
+        with self.lock:
+            hist = self.timings.get(name)
+            return hist.total if hist is not None else 0.0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "timings": {name: hist.snapshot() for name, hist in self.timings.items()},
+            }
+
+    def format_text(self):
+        snap = self.snapshot()
+        lines = []
+        for name, stats in sorted(snap["timings"].items()):
+            if "p50" in stats:
+                lines.append(f"{name}: p50 {stats['p50'] * 1000:.1f} ms, p90 {stats['p90'] * 1000:.1f} ms, "
+                             f"p99 {stats['p99'] * 1000:.1f} ms (n={stats['count']})")
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"{name}: {value}")
+        return "\n".join(lines)
+
+    def to_prometheus(self, prefix="lpr"):
+        snap = self.snapshot()
+        lines = []
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, stats in sorted(snap["timings"].items()):
+            metric = f"{prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for q in QUANTILES:
+                key = f"p{int(q * 100)}"
+                if key in stats:
+                    lines.append(f'{metric}{{quantile="{q}"}} {stats[key]:.6f}')
+            lines.append(f"{metric}_sum {stats['sum']:.6f}")
+            lines.append(f"{metric}_count {stats['count']}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        # Write-then-rename so a reader never sees a half-written file
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(dict(self.snapshot(), ts=time.time()), f, indent=2)
+        os.replace(tmp, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        # Prometheus-style text endpoint at /metrics on a daemon thread
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+METRICS = Metrics()
@@ -0,0 +1,49 @@
+import threading
+import time
+
+import numpy as np
+
+from backends import load_detector, load_ocr, load_with_fallback
+from recognition import detect_plates, read_plates
+
+WARMUP_FRAME_SHAPE = (480, 640, 3)
+WARMUP_CROP_SHAPE = (64, 256, 3)
+
+
+class ModelLoader(threading.Thread):
+    """Loads and warms up the detector and OCR models off the GUI thread.
+
+    `ready` is set when loading finished, successfully or not; check
+    `error` before using `detector` / `ocr`.
+    """
+
+    def __init__(self, detector_path, ocr_name, backend="auto"):
+        super().__init__(daemon=True)
+        self.detector_path = detector_path
+        self.ocr_name = ocr_name
+        self.backend = backend
+        self.detector = None
+        self.ocr = None
+        self.backends = {}
+        self.error = None
+        self.load_seconds = None
+        self.ready = threading.Event()
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            # Heavy imports happen inside the loaders, so the window
+            # doesn't wait for torch either
+            detector, self.backends["detector"] = load_with_fallback(
+                load_detector, self.detector_path, self.backend)
+            ocr, self.backends["ocr"] = load_with_fallback(load_ocr, self.ocr_name, self.backend)
+            # One dummy pass each, so the first real scan doesn't pay for
+            # lazy initialisation and allocator warm-up
+            detect_plates(detector, np.zeros(WARMUP_FRAME_SHAPE, np.uint8))
+            read_plates(ocr, [np.zeros(WARMUP_CROP_SHAPE, np.uint8)])
+            self.detector, self.ocr = detector, ocr
+        except Exception as e:
+            self.error = e
+        finally:
+            self.load_seconds = time.perf_counter() - start
+            self.ready.set()
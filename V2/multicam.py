@@ -0,0 +1,134 @@
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import time
+from dataclasses import dataclass
+
+from config import MODEL_PATH, OCR_MODEL, INFERENCE_BACKEND, DETECTION_CONF
+
+RESULT_QUEUE_SIZE = 256
+RESULT_POLL_SECONDS = 0.5
+
+
+@dataclass
+class PlateEvent:
+    source: str
+    text: str
+    det_conf: float
+    track_id: int
+    ts: float
+
+
+def parse_source(spec):
+    # "bay1=0", "gate=rtsp://...", "videos/bay2.mp4" -> (name, source)
+    name, sep, source = spec.partition("=")
+    if not sep:
+        name, source = spec, spec
+    return name, int(source) if source.isdigit() else source
+
+
+def source_worker(name, source, detector_path, ocr_name, backend, threads,
+                  results, stop_event, loop=False):
+    # Runs in its own process with its own models. Limit the intra-op
+    # threads so N workers don't fight over the same cores.
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    import cv2
+    import torch
+    from backends import load_detector, load_ocr, load_with_fallback
+    from recognition import FrameRecognizer
+
+    torch.set_num_threads(threads)
+    detector, _ = load_with_fallback(load_detector, detector_path, backend)
+    ocr, _ = load_with_fallback(load_ocr, ocr_name, backend)
+    recognizer = FrameRecognizer(detector, ocr, DETECTION_CONF)
+
+    cap = cv2.VideoCapture(source)
+    try:
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                if loop and isinstance(source, str) and os.path.exists(source):
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                break
+            for read in recognizer.process(frame):
+                if read.cached:
+                    continue
+                event = PlateEvent(name, read.text, read.det_conf, read.track_id, read.ts)
+                try:
+                    results.put_nowait(event)
+                except queue.Full:
+                    pass  # the consumer is behind; a fresh read will follow
+    finally:
+        cap.release()
+
+
+class MultiSourceRecognizer:
+    """One recognition process per camera/video source, one shared result queue."""
+
+    def __init__(self, sources, detector_path=MODEL_PATH, ocr_name=OCR_MODEL,
+                 backend=INFERENCE_BACKEND, loop=False):
+        ctx = mp.get_context("spawn")
+        self.results = ctx.Queue(RESULT_QUEUE_SIZE)
+        self.stop_event = ctx.Event()
+        threads = max(1, (os.cpu_count() or 1) // max(1, len(sources)))
+        self.processes = [
+            ctx.Process(
+                target=source_worker,
+                args=(name, source, detector_path, ocr_name, backend, threads,
+                      self.results, self.stop_event, loop),
+                name=f"lpr-{name}",
+                daemon=True,
+            )
+            for name, source in sources
+        ]
+
+    def start(self):
+        for p in self.processes:
+            p.start()
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        for p in self.processes:
+            p.join(timeout)
+            if p.is_alive():
+                p.terminate()
+
+    def alive(self):
+        return any(p.is_alive() for p in self.processes)
+
+    def events(self):
+        # Yields PlateEvents until every source has ended
+        while True:
+            try:
+                yield self.results.get(timeout=RESULT_POLL_SECONDS)
+            except queue.Empty:
+                if not self.alive():
+                    return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognise plates from several cameras at once.")
+    parser.add_argument("sources", nargs="+",
+                        help="camera index, video file or stream URL, optionally as name=source")
+    parser.add_argument("--backend", default=INFERENCE_BACKEND)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--loop", action="store_true", help="restart video files when they end")
+    args = parser.parse_args()
+
+    recognizer = MultiSourceRecognizer(
+        [parse_source(s) for s in args.sources], args.model, OCR_MODEL, args.backend, args.loop)
+    recognizer.start()
+    try:
+        for event in recognizer.events():
+            stamp = time.strftime("%H:%M:%S", time.localtime(event.ts))
+            print(f"{stamp} [{event.source}] {event.text} ({event.det_conf:.2f})")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recognizer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import queue
+import threading
+import time
+
+import cv2
+
+from recognition import PlateRead, FrameRecognizer, read_plates
+from metrics import METRICS
+from tracking import OcrCache
+
+# Small queues on purpose: a slow stage should work on the newest data,
+# not on a backlog of frames the camera produced seconds ago.
+FRAME_QUEUE_SIZE = 2
+CROP_QUEUE_SIZE = 8
+RESULT_QUEUE_SIZE = 64
+QUEUE_POLL_SECONDS = 0.1
+# Crops from several detections/frames are sent to the OCR model together,
+# up to OCR_BATCH_SIZE crops or OCR_BATCH_WAIT seconds after the first one.
+OCR_BATCH_SIZE = 8
+OCR_BATCH_WAIT = 0.05
+
+
+def put_latest(q, item):
+    # Never block the producer: if the consumer is behind, drop the oldest
+    # queued item. Returns how many items were dropped.
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+def collect_batch(q, first, max_size, max_wait):
+    # Gather items that arrive shortly after `first`; stops early on the
+    # end-of-stream marker so it is never held back.
+    batch = [first]
+    deadline = time.monotonic() + max_wait
+    while len(batch) < max_size and first is not None and batch[-1] is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(q.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+def drain(q):
+    items = []
+    while True:
+        try:
+            items.append(q.get_nowait())
+        except queue.Empty:
+            return items
+
+
+class CaptureThread(threading.Thread):
+    def __init__(self, source, out_q, stop_event):
+        super().__init__(daemon=True)
+        self.source = source
+        self.out_q = out_q
+        self.stop_event = stop_event
+        self.latest = None
+
+    def run(self):
+        cap = cv2.VideoCapture(self.source)
+        frame_id = 0
+        try:
+            while not self.stop_event.is_set():
+                with METRICS.timer("capture"):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                frame_id += 1
+                METRICS.inc("frames_read")
+                self.latest = (frame_id, frame)
+                METRICS.inc("frames_dropped", put_latest(self.out_q, (frame_id, frame)))
+        finally:
+            cap.release()
+            # End-of-stream marker for the downstream stages
+            put_latest(self.out_q, None)
+
+
+class DetectionWorker(threading.Thread):
+    def __init__(self, detector, in_q, out_q, results_q, stop_event, ocr_cache, conf=0.4):
+        super().__init__(daemon=True)
+        self.in_q = in_q
+        self.out_q = out_q
+        self.results_q = results_q
+        self.stop_event = stop_event
+        # Only the detection half is used; OcrWorker reads the crops
+        self.recognizer = FrameRecognizer(detector, None, conf, ocr_cache=ocr_cache)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                item = self.in_q.get(timeout=QUEUE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is None:
+                put_latest(self.out_q, None)
+                return
+            frame_id, frame = item
+            jobs, reads = self.recognizer.detect_and_claim(frame, frame_id)
+            for box, crop, track_id, fingerprint in jobs:
+                METRICS.inc("crops_dropped", put_latest(self.out_q, (frame_id, box, crop, track_id, fingerprint)))
+            for read in reads:
+                put_latest(self.results_q, read)
+
+
+class OcrWorker(threading.Thread):
+    def __init__(self, ocr, in_q, out_q, stop_event, ocr_cache,
+                 max_batch=OCR_BATCH_SIZE, max_wait=OCR_BATCH_WAIT):
+        super().__init__(daemon=True)
+        self.ocr = ocr
+        self.in_q = in_q
+        self.out_q = out_q
+        self.stop_event = stop_event
+        self.ocr_cache = ocr_cache
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.done = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    item = self.in_q.get(timeout=QUEUE_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                batch = collect_batch(self.in_q, item, self.max_batch, self.max_wait)
+                jobs = [job for job in batch if job is not None]
+                texts = read_plates(self.ocr, [job[2] for job in jobs])
+                for (frame_id, box, _, track_id, fingerprint), txt in zip(jobs, texts):
+                    self.ocr_cache.store(track_id, fingerprint, txt)
+                    if txt:
+                        put_latest(self.out_q, PlateRead(frame_id, box, box[4], txt, track_id))
+                if len(jobs) < len(batch):
+                    return
+        finally:
+            self.done.set()
+
+
+class ScanPipeline:
+    """Capture -> detection -> OCR, each stage on its own thread.
+
+    Nothing here touches Tk; the GUI polls drain_results() and
+    preview_frame() from its own after() callbacks.
+    """
+
+    def __init__(self, source, detector, ocr, conf=0.4):
+        self.stop_event = threading.Event()
+        self.frames = queue.Queue(FRAME_QUEUE_SIZE)
+        self.crops = queue.Queue(CROP_QUEUE_SIZE)
+        self.results = queue.Queue(RESULT_QUEUE_SIZE)
+        self.ocr_cache = OcrCache()
+        self.capture = CaptureThread(source, self.frames, self.stop_event)
+        self.detection = DetectionWorker(detector, self.frames, self.crops, self.results,
+                                         self.stop_event, self.ocr_cache, conf)
+        self.recognition = OcrWorker(ocr, self.crops, self.results, self.stop_event, self.ocr_cache)
+        self.threads = [self.capture, self.detection, self.recognition]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def stop(self, timeout=1.0):
+        # Only wait for the camera to be released; the inference workers
+        # exit on their own once their current call returns.
+        self.stop_event.set()
+        self.capture.join(timeout)
+
+    def running(self):
+        # True until every stage has exited. The models are shared with the
+        # next scan and aren't thread-safe, so it must wait for this.
+        return any(t.is_alive() for t in self.threads)
+
+    def finished(self):
+        return self.recognition.done.is_set()
+
+    def drain_results(self):
+        return drain(self.results)
+
+    def preview_frame(self):
+        latest = self.capture.latest
+        if latest is None:
+            return None
+        frame = latest[1].copy()
+        for box in self.detection.recognizer.latest_boxes:
+            x1, y1, x2, y2 = map(int, box[:4])
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        return frame
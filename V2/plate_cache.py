@@ -0,0 +1,48 @@
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import METRICS
+
+
+class PlateCache:
+    """Bounded LRU of plate key -> Customer, with a TTL.
+
+    The repositories write through it on every change made from this
+    process; the TTL bounds how long a change made from another station
+    can go unseen.
+    """
+
+    def __init__(self, max_entries=2048, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # plate_key -> (customer, expires_at)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.entries.move_to_end(key)
+                METRICS.inc("customer_cache_hits")
+                return entry[0]
+            if entry is not None:
+                del self.entries[key]
+        METRICS.inc("customer_cache_misses")
+        return None
+
+    def put(self, key, customer):
+        with self.lock:
+            self.entries[key] = (customer, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
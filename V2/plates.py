@@ -0,0 +1,28 @@
+import re
+import unicodedata
+
+# Persian and Arabic-Indic digits -> ASCII
+DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "0123456789" * 2)
+# Arabic code points that look like the Persian letters used on plates
+LETTER_VARIANTS = str.maketrans({"ي": "ی", "ى": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "ـ": None})
+# Glyphs produced by arabic_reshaper (to_rtl) instead of plain letters
+PRESENTATION_FORMS = re.compile("[\ufb50-\ufdff\ufe70-\ufeff]")
+VISUAL_TOKENS = re.compile(r"\d+|\D")
+
+
+def to_logical_order(text):
+    # Undo to_rtl()'s reordering: runs of digits keep their direction,
+    # everything else (letters, separators) was reversed around them
+    return "".join(reversed(VISUAL_TOKENS.findall(text)))
+
+
+def normalize_plate(text):
+    """Canonical key for a plate, whether it came from OCR, the plate
+    entry field or a to_rtl()'d string stored by older versions."""
+    if not text:
+        return ""
+    if PRESENTATION_FORMS.search(text):
+        text = to_logical_order(text)
+    text = unicodedata.normalize("NFKC", text)
+    text = text.translate(DIGITS).translate(LETTER_VARIANTS)
+    return "".join(ch for ch in text if ch.isalnum())
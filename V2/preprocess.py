@@ -0,0 +1,128 @@
+import math
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+
+# Tilts below MIN_SKEW aren't worth correcting; above MAX_SKEW the estimate
+# is more likely wrong than the plate that crooked
+MIN_SKEW_DEGREES = 1.0
+MAX_SKEW_DEGREES = 15.0
+DEFAULT_SIZE = (256, 64)  # (width, height) the OCR model was trained on
+
+
+def clamp_box(box, shape):
+    # Integer (x1, y1, x2, y2) inside a frame of `shape`; None if nothing is left
+    h, w = shape[:2]
+    x1 = min(max(int(box[0]), 0), w)
+    y1 = min(max(int(box[1]), 0), h)
+    x2 = min(max(int(math.ceil(box[2])), 0), w)
+    y2 = min(max(int(math.ceil(box[3])), 0), h)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+
+def skew_angle(crop):
+    # Tilt of the text line in radians: principal axis of the dark
+    # (character) pixels, from second-order image moments
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    m = cv2.moments(ink, binaryImage=True)
+    if m["m00"] < 0.05 * ink.size:
+        return 0.0
+    angle = 0.5 * math.atan2(2 * m["mu11"], m["mu20"] - m["mu02"])
+    if not MIN_SKEW_DEGREES <= abs(math.degrees(angle)) <= MAX_SKEW_DEGREES:
+        return 0.0
+    return angle
+
+
+class CropPreprocessor:
+    """Turns plate crops into the OCR model's input batch.
+
+    Every crop goes through one warpPerspective (deskew + resize, and the
+    horizontal mirror if the model wants it) written straight into a
+    reused uint8 batch buffer; the whole batch is then scaled and
+    normalised in place into a reused float32 NCHW buffer. Buffers only
+    grow, so steady state allocates nothing per crop.
+
+    Not thread-safe: the returned array is a view of the buffer and is
+    overwritten by the next call.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE, mean=None, std=None, rescale=None,
+                 mirror=False, gray_scale=False, deskew=True):
+        self.width, self.height = size
+        self.mirror = mirror
+        self.gray_scale = gray_scale
+        self.deskew = deskew
+        channels = 1 if gray_scale else 3
+        mean = np.zeros(channels) if mean is None else np.asarray(mean, np.float64)
+        std = np.ones(channels) if std is None else np.asarray(std, np.float64)
+        rescale = 1.0 if rescale is None else rescale
+        # (x * rescale - mean) / std == x * scale - shift
+        self.scale = (rescale / std).astype(np.float32).reshape(1, -1, 1, 1)
+        self.shift = (mean / std).astype(np.float32).reshape(1, -1, 1, 1)
+        self.target = np.float32([[0, 0], [self.width, 0], [self.width, self.height], [0, self.height]])
+        if mirror:
+            self.target = self.target[[1, 0, 3, 2]]
+        self.warped = np.empty((0, self.height, self.width, 3), np.uint8)
+        self.pixels = np.empty((0, channels, self.height, self.width), np.float32)
+
+    @classmethod
+    def from_hezar(cls, model, deskew=True):
+        # Same resize/normalisation as the model's own image processor
+        processor = model.preprocessor
+        if isinstance(processor, dict):
+            processor = processor.get("image_processor") or next(iter(processor.values()))
+        config = processor.config
+        return cls(
+            size=tuple(getattr(config, "size", None) or DEFAULT_SIZE),  # hezar sizes are (width, height)
+            mean=getattr(config, "mean", None),
+            std=getattr(config, "std", None),
+            rescale=getattr(config, "rescale", None),
+            mirror=bool(getattr(config, "mirror", False)),
+            gray_scale=bool(getattr(config, "gray_scale", False)),
+            deskew=deskew,
+        )
+
+    def _reserve(self, n):
+        if n > len(self.warped):
+            capacity = max(n, 2 * len(self.warped), 8)
+            self.warped = np.empty((capacity,) + self.warped.shape[1:], np.uint8)
+            self.pixels = np.empty((capacity,) + self.pixels.shape[1:], np.float32)
+
+    def source_quad(self, crop):
+        # Corners of the crop, rotated about its centre by the text tilt
+        h, w = crop.shape[:2]
+        corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+        angle = skew_angle(crop) if self.deskew else 0.0
+        if angle:
+            centre = np.float32([w / 2, h / 2])
+            c, s = math.cos(angle), math.sin(angle)
+            rotation = np.float32([[c, -s], [s, c]])
+            corners = (corners - centre) @ rotation.T + centre
+        return corners
+
+    def __call__(self, crops):
+        # -> float32 array (n, channels, height, width), a view of the buffer
+        n = len(crops)
+        self._reserve(n)
+        with METRICS.timer("preprocess"):
+            for i, crop in enumerate(crops):
+                if crop.ndim == 2:
+                    crop = cv2.cvtColor(crop, cv2.COLOR_GRAY2BGR)
+                matrix = cv2.getPerspectiveTransform(self.source_quad(crop), self.target)
+                cv2.warpPerspective(crop, matrix, (self.width, self.height), dst=self.warped[i],
+                                    flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+            batch = self.warped[:n]
+            pixels = self.pixels[:n]
+            if self.gray_scale:
+                # BGR -> luma, straight into the single channel
+                np.einsum("nhwc,c->nhw", batch, np.float32([0.114, 0.587, 0.299]), out=pixels[:, 0])
+            else:
+                np.copyto(pixels, batch.transpose(0, 3, 1, 2))
+            pixels *= self.scale
+            pixels -= self.shift
+        return pixels
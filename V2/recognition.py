@@ -0,0 +1,131 @@
+from dataclasses import dataclass, field
+import time
+
+from metrics import METRICS
+from preprocess import clamp_box
+from tracking import IouTracker, OcrCache, crop_fingerprint
+from scheduler import DetectionScheduler, RoiPlanner
+
+
+@dataclass
+class PlateRead:
+    frame_id: int
+    box: tuple
+    det_conf: float
+    text: str
+    track_id: int = None
+    cached: bool = False
+    ts: float = field(default_factory=time.time)
+
+
+def detect_plates(detector, frame, conf=0.4, window=None, imgsz=None):
+    # Returns [(x1, y1, x2, y2, conf, cls), ...] in frame coordinates.
+    # With a window, only that part of the frame is searched (optionally
+    # at a smaller model input size).
+    ox, oy = 0, 0
+    if window is not None:
+        ox, oy = window[:2]
+        frame = frame[oy:window[3], ox:window[2]]
+    kwargs = {"imgsz": imgsz} if imgsz else {}
+    with METRICS.timer("detect"):
+        res = detector(frame, conf=conf, **kwargs)[0]
+        boxes = [(x1 + ox, y1 + oy, x2 + ox, y2 + oy, c, cls)
+                 for x1, y1, x2, y2, c, cls in (box[:6] for box in res.boxes.data.tolist())]
+    METRICS.inc("detections", len(boxes))
+    return boxes
+
+
+def detect_plates_batch(detector, frames, conf=0.4):
+    # One forward pass over several frames; a box list per frame. Only
+    # used with the torch backend; exported detectors are run a frame at
+    # a time.
+    with METRICS.timer("detect"):
+        results = detector(list(frames), conf=conf)
+        batches = [[tuple(box[:6]) for box in res.boxes.data.tolist()] for res in results]
+    METRICS.inc("detections", sum(len(boxes) for boxes in batches))
+    return batches
+
+
+def crop_plate(frame, box):
+    # A view of the frame, with the box clamped to it (negative
+    # coordinates would otherwise wrap around); empty if nothing is left
+    with METRICS.timer("crop"):
+        clamped = clamp_box(box, frame.shape)
+        if clamped is None:
+            return frame[:0, :0]
+        x1, y1, x2, y2 = clamped
+        return frame[y1:y2, x1:x2]
+
+
+def read_plate(ocr, crop):
+    return read_plates(ocr, [crop])[0]
+
+
+def read_plates(ocr, crops):
+    # One predict() call for the whole batch; texts come back in input order
+    if not crops:
+        return []
+    with METRICS.timer("ocr"):
+        if hasattr(ocr, "predict_crops"):
+            outputs = ocr.predict_crops(crops)
+        else:
+            outputs = ocr.predict(list(crops))
+    METRICS.inc("ocr_calls")
+    METRICS.inc("ocr_crops", len(crops))
+    with METRICS.timer("normalize"):
+        return [out['text'].strip() for out in outputs]
+
+
+class FrameRecognizer:
+    """Schedule -> detect -> track -> OCR for one stream, on the calling thread.
+
+    The synchronous counterpart of ScanPipeline for headless workers that
+    own their models and camera. ScanPipeline's detection stage runs
+    detect_and_claim() and leaves the OCR to its own thread.
+    """
+
+    def __init__(self, detector, ocr, conf=0.4, scheduler=True, roi=True, ocr_cache=None):
+        self.detector = detector
+        self.ocr = ocr
+        self.conf = conf
+        self.tracker = IouTracker()
+        self.scheduler = DetectionScheduler() if scheduler else None
+        self.roi = RoiPlanner() if roi else None
+        self.ocr_cache = OcrCache() if ocr_cache is None else ocr_cache
+        self.latest_boxes = []
+        self.frame_id = 0
+
+    def detect_and_claim(self, frame, frame_id):
+        # -> (jobs, cached reads); jobs are the (box, crop, track_id,
+        # fingerprint) crops that still need OCR
+        if self.scheduler is not None and not self.scheduler.should_detect(frame, self.tracker):
+            return [], []
+        if self.roi is not None:
+            window = self.roi.plan(frame, self.tracker)
+            boxes = detect_plates(self.detector, frame, self.conf, window, self.roi.imgsz if window else None)
+            self.roi.report(window, boxes)
+        else:
+            boxes = detect_plates(self.detector, frame, self.conf)
+        self.latest_boxes = boxes
+        jobs, reads = [], []
+        for box, track_id in zip(boxes, self.tracker.update(boxes)):
+            crop = crop_plate(frame, box)
+            if not crop.size:
+                continue
+            fingerprint = crop_fingerprint(crop)
+            needs_ocr, text = self.ocr_cache.claim(track_id, fingerprint)
+            if needs_ocr:
+                jobs.append((box, crop, track_id, fingerprint))
+            elif text:
+                reads.append(PlateRead(frame_id, box, box[4], text, track_id, cached=True))
+        return jobs, reads
+
+    def process(self, frame):
+        self.frame_id += 1
+        jobs, reads = self.detect_and_claim(frame, self.frame_id)
+        texts = read_plates(self.ocr, [crop for _, crop, _, _ in jobs])
+        for (box, _, track_id, fingerprint), txt in zip(jobs, texts):
+            self.ocr_cache.store(track_id, fingerprint, txt)
+            if txt:
+                reads.append(PlateRead(self.frame_id, box, box[4], txt, track_id))
+        return reads
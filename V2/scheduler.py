@@ -0,0 +1,105 @@
+import time
+
+import cv2
+
+from metrics import METRICS
+
+MOTION_SIZE = (64, 36)  # (width, height) of the frame used for the motion check
+# A window covering more of the frame than this saves too little to bother
+ROI_MAX_AREA = 0.5
+
+
+class DetectionScheduler:
+    """Decides which frames are worth running the plate detector on.
+
+    - while a tracked plate sits still, detect only every `stride` frames
+    - a plate that was just found but hasn't settled yet is detected every
+      frame, so the OCR gets the reads it needs to decide
+    - with nothing tracked, detect when the downscaled frame difference shows motion
+    - with no motion, still detect every `idle_interval` seconds so a car
+      that crept in slowly is not missed
+    """
+
+    def __init__(self, motion_threshold=4.0, stride=5, idle_interval=2.0):
+        self.motion_threshold = motion_threshold
+        self.stride = stride
+        self.idle_interval = idle_interval
+        self.reference = None
+        self.last_detect = None
+        self.frames_since_detect = 0
+
+    def motion_score(self, frame):
+        small = cv2.resize(frame, MOTION_SIZE, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (3, 3), 0)
+        reference, self.reference = self.reference, gray
+        if reference is None:
+            return float("inf")
+        return float(cv2.absdiff(gray, reference).mean())
+
+    def should_detect(self, frame, tracker):
+        now = time.monotonic()
+        moved = self.motion_score(frame) >= self.motion_threshold
+        self.frames_since_detect += 1
+
+        if self.last_detect is None:
+            run = True
+        elif tracker.stable():
+            run = self.frames_since_detect >= self.stride
+        elif tracker.live():
+            run = True
+        else:
+            run = moved or now - self.last_detect >= self.idle_interval
+
+        if run:
+            self.last_detect = now
+            self.frames_since_detect = 0
+        else:
+            METRICS.inc("frames_skipped")
+        return run
+
+
+class RoiPlanner:
+    """Decides where to run the plate detector once a plate is locked on.
+
+    While tracks are live, the detector only sees a padded window around
+    their boxes, at the small input size `imgsz`, instead of the whole
+    frame at the model's full size. A full-frame pass still runs every
+    `full_interval` seconds (a second car may have pulled in) and straight
+    after a window pass that found nothing (the plate left the window).
+    """
+
+    def __init__(self, imgsz=320, padding=1.0, full_interval=1.0):
+        self.imgsz = imgsz
+        self.padding = padding
+        self.full_interval = full_interval
+        self.last_full = None
+        self.lost = False
+
+    def plan(self, frame, tracker):
+        # (x1, y1, x2, y2) window in frame pixels, or None for the full frame
+        now = time.monotonic()
+        live = [track.box for track in tracker.tracks.values() if track.missed == 0]
+        if (self.lost or not live or self.last_full is None
+                or now - self.last_full >= self.full_interval):
+            self.last_full = now
+            self.lost = False
+            METRICS.inc("detect_full_frame")
+            return None
+        h, w = frame.shape[:2]
+        x1 = min(box[0] for box in live)
+        y1 = min(box[1] for box in live)
+        x2 = max(box[2] for box in live)
+        y2 = max(box[3] for box in live)
+        pad_x = (x2 - x1) * self.padding
+        pad_y = (y2 - y1) * self.padding
+        window = (max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y)),
+                  min(w, int(x2 + pad_x) + 1), min(h, int(y2 + pad_y) + 1))
+        if (window[2] - window[0]) * (window[3] - window[1]) > ROI_MAX_AREA * w * h:
+            METRICS.inc("detect_full_frame")
+            return None
+        METRICS.inc("detect_roi")
+        return window
+
+    def report(self, window, boxes):
+        if window is not None and not boxes:
+            self.lost = True
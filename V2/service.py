@@ -0,0 +1,332 @@
+import argparse
+import json
+import mimetypes
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future, TimeoutError as ResultTimeout
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from config import MODEL_PATH, OCR_MODEL, INFERENCE_BACKEND, DETECTION_CONF
+from config import DATABASE_URL, DB_POOL_SIZE, CUSTOMER_CACHE_SIZE, CUSTOMER_CACHE_TTL
+from config import SERVICE_PORT, SERVICE_MAX_INFLIGHT, SERVICE_QUEUE_SIZE
+from config import SERVICE_BATCH_SIZE, SERVICE_BATCH_WAIT, SERVICE_TIMEOUT, SERVICE_MAX_UPLOAD
+from db import open_pool, migrate, CustomerRepository
+from events import open_event_log
+from fuzzy import PlateIndex, confident_match
+from metrics import METRICS
+from pipeline import collect_batch
+from plate_cache import PlateCache
+from recognition import detect_plates, detect_plates_batch, crop_plate, read_plates
+
+RETRY_AFTER_SECONDS = 1
+
+
+class Overloaded(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+class MicroBatcher(threading.Thread):
+    """Runs `fn` over items submitted from many threads, a batch at a time.
+
+    Items that arrive within `max_wait` of each other (up to `max_batch`)
+    go into one call of `fn(items) -> results`, so concurrent requests
+    share one model call instead of queuing for it one by one. The queue
+    is bounded: submit() raises Overloaded rather than letting a backlog
+    build up.
+    """
+
+    def __init__(self, fn, name, max_batch=SERVICE_BATCH_SIZE, max_wait=SERVICE_BATCH_WAIT,
+                 max_queue=SERVICE_QUEUE_SIZE):
+        super().__init__(daemon=True, name=f"{name}-batcher")
+        self.fn = fn
+        self.metric = name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending = queue.Queue(max_queue)
+
+    def submit(self, item):
+        future = Future()
+        try:
+            self.pending.put_nowait((item, future))
+        except queue.Full:
+            raise Overloaded(f"{self.metric} queue is full") from None
+        return future
+
+    def map(self, items, timeout=None):
+        futures = [self.submit(item) for item in items]
+        return [future.result(timeout) for future in futures]
+
+    def close(self):
+        self.pending.put(None)
+
+    def run(self):
+        while True:
+            batch = collect_batch(self.pending, self.pending.get(), self.max_batch, self.max_wait)
+            jobs = [job for job in batch if job is not None]
+            if jobs:
+                self._run_batch(jobs)
+            if len(jobs) < len(batch):
+                return
+
+    def _run_batch(self, jobs):
+        # items / batches is the average batch size
+        METRICS.inc(f"{self.metric}_batches")
+        METRICS.inc(f"{self.metric}_items", len(jobs))
+        try:
+            results = self.fn([item for item, _ in jobs])
+        except Exception as e:
+            for _, future in jobs:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(jobs, results):
+            future.set_result(result)
+
+
+class RecognitionService:
+    """Plates, boxes, confidences and customer matches for uploaded images.
+
+    Detection and OCR each run on their own MicroBatcher, so the models are
+    only ever called from one thread and concurrent requests are batched.
+    """
+
+    def __init__(self, detector, ocr, customers, detector_batches=False, conf=DETECTION_CONF,
+                 max_inflight=SERVICE_MAX_INFLIGHT, timeout=SERVICE_TIMEOUT, events=None):
+        if detector_batches:
+            detect = lambda frames: detect_plates_batch(detector, frames, conf)
+        else:
+            detect = lambda frames: [detect_plates(detector, frame, conf) for frame in frames]
+        self.detector = MicroBatcher(detect, "service_detect")
+        self.ocr = MicroBatcher(lambda crops: read_plates(ocr, crops), "service_ocr")
+        self.customers = customers
+        self.events = events
+        self.plate_index = PlateIndex()
+        self.slots = threading.BoundedSemaphore(max_inflight)
+        self.timeout = timeout
+
+    def start(self):
+        self.detector.start()
+        self.ocr.start()
+        threading.Thread(target=self._build_plate_index, daemon=True).start()
+
+    def close(self):
+        self.detector.close()
+        self.ocr.close()
+
+    def _build_plate_index(self):
+        for key, cid in self.customers.iter_plate_keys():
+            self.plate_index.add(key, cid)
+
+    def match(self, text):
+        # (customer, "exact" | "fuzzy") or (None, None)
+        customer = self.customers.find_by_plate(text)
+        if customer:
+            return customer, "exact"
+        match = confident_match(self.plate_index.search(text))
+        if match:
+            customer = self.customers.find_by_plate(match[1])
+            if customer:
+                return customer, "fuzzy"
+        return None, None
+
+    def recognize(self, frame):
+        t0 = time.perf_counter()
+        boxes = self.detector.submit(frame).result(self.timeout)
+        t1 = time.perf_counter()
+        crops = [(box, crop_plate(frame, box)) for box in boxes]
+        crops = [(box, crop) for box, crop in crops if crop.size]
+        texts = self.ocr.map([crop for _, crop in crops], self.timeout)
+        t2 = time.perf_counter()
+        plates = []
+        for (box, _), text in zip(crops, texts):
+            customer, how = self.match(text) if text else (None, None)
+            plates.append({
+                "text": text,
+                "box": [round(v, 1) for v in box[:4]],
+                "confidence": round(box[4], 4),
+                "customer": customer._asdict() if customer else None,
+                "match": how,
+            })
+        t3 = time.perf_counter()
+        if self.events is not None:
+            timings = {"detect_ms": (t1 - t0) * 1000, "ocr_ms": (t2 - t1) * 1000, "total_ms": (t3 - t0) * 1000}
+            for plate in plates or [{"text": None, "confidence": None, "customer": None}]:
+                customer = plate["customer"]
+                self.events.record("service", plate["text"], plate["confidence"], None,
+                                   customer["id"] if customer else None, timings)
+        return {
+            "plates": plates,
+            "timings_ms": {
+                "detect": round((t1 - t0) * 1000, 1),
+                "ocr": round((t2 - t1) * 1000, 1),
+                "match": round((t3 - t2) * 1000, 1),
+            },
+        }
+
+
+def extract_image(content_type, body):
+    # Raw image body, or the first image part of a multipart/form-data upload
+    if not content_type.startswith("multipart/form-data"):
+        return body
+    head = f"Content-Type: {content_type}\r\n\r\n".encode()
+    message = BytesParser(policy=policy.HTTP).parsebytes(head + body)
+    for part in message.iter_parts():
+        if part.get_content_maintype() == "image" or part.get_param("name", header="content-disposition") == "image":
+            return part.get_payload(decode=True)
+    raise BadRequest("no image part in the upload")
+
+
+def decode_image(data):
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise BadRequest("not a JPEG/PNG image")
+    return frame
+
+
+def make_handler(service, max_upload=SERVICE_MAX_UPLOAD):
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status, payload, headers=()):
+            body = json.dumps(payload, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self.send_json(200, {"status": "ok", "known_plates": len(service.plate_index)})
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            if self.path != "/recognize":
+                self.send_error(404)
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            # The body of a request rejected here isn't read, so the
+            # connection can't be reused for another request
+            if length < 0:
+                self.send_json(400, {"error": "bad Content-Length"}, [("Connection", "close")])
+                return
+            if not length:
+                self.send_json(400, {"error": "empty upload"})
+                return
+            if length > max_upload:
+                self.send_json(413, {"error": f"upload larger than {max_upload} bytes"},
+                               [("Connection", "close")])
+                return
+            # Read even a rejected upload, so the client sees the reply
+            # instead of a reset connection
+            body = self.rfile.read(length)
+            if not service.slots.acquire(blocking=False):
+                METRICS.inc("service_rejected")
+                self.send_json(503, {"error": "busy"}, [("Retry-After", str(RETRY_AFTER_SECONDS))])
+                return
+            try:
+                METRICS.inc("service_requests")
+                with METRICS.timer("service_request"):
+                    frame = decode_image(extract_image(self.headers.get("Content-Type", ""), body))
+                    result = service.recognize(frame)
+                self.send_json(200, result)
+            except BadRequest as e:
+                self.send_json(400, {"error": str(e)})
+            except Overloaded as e:
+                METRICS.inc("service_rejected")
+                self.send_json(503, {"error": str(e)}, [("Retry-After", str(RETRY_AFTER_SECONDS))])
+            except ResultTimeout:
+                METRICS.inc("service_errors")
+                self.send_json(504, {"error": "recognition timed out"})
+            except Exception as e:
+                METRICS.inc("service_errors")
+                self.send_json(500, {"error": str(e)})
+            finally:
+                service.slots.release()
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def recognize_file(path, url=f"http://127.0.0.1:{SERVICE_PORT}/recognize", timeout=30):
+    # Minimal client: POST the file as a raw body and return the JSON reply
+    with open(path, "rb") as f:
+        data = f.read()
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": content_type})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        return json.load(e)
+
+
+def serve(args):
+    from model_loader import ModelLoader
+
+    pool = open_pool(args.db, DB_POOL_SIZE)
+    migrate(pool)
+    loader = ModelLoader(args.model, OCR_MODEL, args.backend)
+    loader.run()
+    if loader.error is not None:
+        raise SystemExit(f"model loading failed: {loader.error}")
+
+    customers = CustomerRepository(pool, PlateCache(CUSTOMER_CACHE_SIZE, CUSTOMER_CACHE_TTL))
+    service = RecognitionService(loader.detector, loader.ocr, customers,
+                                 detector_batches=loader.backends["detector"] == "torch",
+                                 max_inflight=args.max_inflight, events=open_event_log(pool))
+    service.start()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(service))
+    print(f"recognition service on http://127.0.0.1:{args.port}/recognize ({loader.backends})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        service.events.close()
+        pool.close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP plate recognition service.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    srv = sub.add_parser("serve", help="run the service on 127.0.0.1")
+    srv.add_argument("--port", type=int, default=SERVICE_PORT)
+    srv.add_argument("--max-inflight", type=int, default=SERVICE_MAX_INFLIGHT)
+    srv.add_argument("--db", default=DATABASE_URL)
+    srv.add_argument("--backend", default=INFERENCE_BACKEND)
+    srv.add_argument("--model", default=MODEL_PATH)
+    cli = sub.add_parser("recognize", help="send images to a running service")
+    cli.add_argument("images", nargs="+")
+    cli.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args)
+        return
+    url = f"http://127.0.0.1:{args.port}/recognize"
+    for path in args.images:
+        print(path, json.dumps(recognize_file(path, url), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import pytest
+
+import db
+from db import open_pool, migrate
+
+
+def failing(cur, dialect):
+    cur.execute("CREATE TABLE half_done (id INTEGER)")
+    raise RuntimeError("migration failed halfway")
+
+
+def test_failed_migration_leaves_nothing_behind(tmp_path, monkeypatch):
+    pool = open_pool(f"sqlite:{tmp_path / 'shop.db'}", 1)
+    shipped = list(db.MIGRATIONS)
+    version = shipped[-1][0] + 1
+    monkeypatch.setattr(db, "MIGRATIONS", shipped + [(version, "half done", failing)])
+    with pytest.raises(RuntimeError):
+        migrate(pool)
+
+    # The shipped migrations committed; the failed one left no table behind
+    with pool.transaction() as cur:
+        cur.execute("SELECT MAX(version) FROM schema_version")
+        assert cur.fetchone()[0] == version - 1
+        cur.execute("SELECT name FROM sqlite_master WHERE name='half_done'")
+        assert cur.fetchone() is None
+
+    def fixed(cur, dialect):
+        cur.execute("CREATE TABLE half_done (id INTEGER)")
+
+    monkeypatch.setattr(db, "MIGRATIONS", shipped + [(version, "half done", fixed)])
+    migrate(pool)
+    with pool.transaction() as cur:
+        cur.execute("SELECT MAX(version) FROM schema_version")
+        assert cur.fetchone()[0] == version
+    pool.close_all()
+
+
+def test_unparseable_timestamp_aborts_the_retype(tmp_path, monkeypatch):
+    pool = open_pool(f"sqlite:{tmp_path / 'shop.db'}", 1)
+    shipped = list(db.MIGRATIONS)
+    monkeypatch.setattr(db, "MIGRATIONS", shipped[:2])
+    migrate(pool)
+    with pool.transaction() as cur:
+        cur.execute("INSERT INTO customers (name, plate, created_at) VALUES ('a', '12ب34511', '1402-05-01 10:30')")
+        cur.execute("INSERT INTO customers (name, plate, created_at) VALUES ('b', '12ب34522', 'last tuesday')")
+
+    monkeypatch.setattr(db, "MIGRATIONS", shipped[:3])
+    with pytest.raises(ValueError, match="1 customers.created_at"):
+        migrate(pool)
+    # Rolled back: the original text is still there
+    with pool.transaction() as cur:
+        cur.execute("SELECT created_at FROM customers ORDER BY id")
+        assert [row[0] for row in cur.fetchall()] == ["1402-05-01 10:30", "last tuesday"]
+    pool.close_all()
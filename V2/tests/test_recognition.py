@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from consensus import PlateVoter
+from recognition import FrameRecognizer
+
+PLATE = (260, 300, 380, 330)  # (x1, y1, x2, y2) of the plate in the test frames
+TEXT = "12ب34567"
+# One second of a 30 fps camera
+MAX_FRAMES = 30
+
+
+class BrightBoxDetector:
+    """Stands in for YOLO: one box around the white plate of the image it is given."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, image, conf=0.4, imgsz=None):
+        self.calls += 1
+        ys, xs = np.nonzero(image[..., 0] > 200)
+        rows = [[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1, 0.9, 0]] if len(xs) else []
+        data = np.array(rows, np.float64).reshape(-1, 6)
+        return [SimpleNamespace(boxes=SimpleNamespace(data=data))]
+
+
+class ScriptedOcr:
+    """Returns `texts` one crop at a time, then keeps repeating the last one."""
+
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.calls = 0
+
+    def predict(self, crops):
+        out = []
+        for _ in crops:
+            out.append({"text": self.texts[min(self.calls, len(self.texts) - 1)]})
+            self.calls += 1
+        return out
+
+
+def static_frames(n, plate=True, seed=0):
+    # A parked car: the same scene every frame, with a little sensor noise
+    rng = np.random.default_rng(seed)
+    scene = np.full((480, 640, 3), 60, np.int16)
+    if plate:
+        x1, y1, x2, y2 = PLATE
+        scene[y1:y2, x1:x2] = 250
+        scene[y1 + 8:y2 - 8, x1 + 10:x2 - 10:12] = 30  # characters
+    for _ in range(n):
+        noise = rng.integers(-3, 4, scene.shape)
+        yield np.clip(scene + noise, 0, 255).astype(np.uint8)
+
+
+def scan(recognizer, frames, voter):
+    # Frames until the voter decided, the way the scan button counts reads
+    for n, frame in enumerate(frames, 1):
+        for read in recognizer.process(frame):
+            if not read.cached:
+                voter.add(read.text, read.det_conf)
+        if voter.decided():
+            return n
+    return None
+
+
+def test_parked_car_decides_within_a_second():
+    recognizer = FrameRecognizer(BrightBoxDetector(), ScriptedOcr(TEXT))
+    voter = PlateVoter(0.8, 3)
+    frames = scan(recognizer, static_frames(MAX_FRAMES), voter)
+    assert frames is not None and frames <= 5
+    assert voter.best()[0] == TEXT
+
+
+def test_wrong_first_read_is_outvoted():
+    ocr = ScriptedOcr("12ب34599", TEXT)
+    recognizer = FrameRecognizer(BrightBoxDetector(), ocr)
+    voter = PlateVoter(0.8, 3)
+    assert scan(recognizer, static_frames(MAX_FRAMES), voter) is not None
+    assert voter.best()[0] == TEXT
+    # The cache only takes over once the reads agree
+    assert ocr.calls >= 4
+
+
+def test_empty_scene_is_not_detected_every_frame():
+    detector = BrightBoxDetector()
+    recognizer = FrameRecognizer(detector, ScriptedOcr(TEXT))
+    for frame in static_frames(MAX_FRAMES, plate=False):
+        assert recognizer.process(frame) == []
+    assert detector.calls == 1
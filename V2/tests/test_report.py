@@ -0,0 +1,23 @@
+from datetime import datetime
+
+import pandas as pd
+
+from db import open_pool, migrate, CustomerRepository, ServiceRepository
+from report import DueServiceReport
+
+
+def test_last_date_is_the_date_of_the_last_km(tmp_path):
+    pool = open_pool(f"sqlite:{tmp_path / 'shop.db'}", 1)
+    migrate(pool)
+    customers = CustomerRepository(pool)
+    services = ServiceRepository(pool, customers)
+    customers.add("a", "0912", "12ب34511", 21000, "pride", created_at=datetime(2024, 1, 1))
+    # Entered out of order: the 20000 km service is a month older than the 10000 km one
+    services.register("12ب34511", ["روغن موتور"], 20000, "", date=datetime(2024, 5, 1))
+    services.register("12ب34511", ["روغن موتور"], 10000, "", date=datetime(2024, 6, 1))
+
+    report = DueServiceReport(pool).build(today=datetime(2024, 6, 15))
+    row = report[report["service_name"] == "روغن موتور"].iloc[0]
+    assert row["last_km"] == 20000
+    assert row["last_date"] == pd.Timestamp(2024, 5, 1)
+    pool.close_all()
@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+
+FINGERPRINT_SIZE = (32, 8)  # (width, height) of the difference hash
+
+
+def iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    if not inter:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / (area_a + area_b - inter)
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.hits = 1
+        self.missed = 0
+        self.still = 0  # consecutive matches where the box barely moved
+
+
+class IouTracker:
+    """Greedy IoU matching of detector boxes to the tracks of the last frames."""
+
+    def __init__(self, iou_threshold=0.3, max_missed=10, still_iou=0.8, stable_hits=3):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.still_iou = still_iou
+        self.stable_hits = stable_hits
+        self.tracks = {}
+        self.next_id = 1
+
+    def update(self, boxes):
+        # Returns one track id per box, in the order of `boxes`
+        pairs = sorted(
+            ((iou(track.box, box), tid, i)
+             for tid, track in self.tracks.items()
+             for i, box in enumerate(boxes)),
+            reverse=True,
+        )
+        ids = [None] * len(boxes)
+        matched = set()
+        for score, tid, i in pairs:
+            if score < self.iou_threshold:
+                break
+            if tid in matched or ids[i] is not None:
+                continue
+            track = self.tracks[tid]
+            track.box = boxes[i]
+            track.hits += 1
+            track.still = track.still + 1 if score >= self.still_iou else 0
+            track.missed = 0
+            matched.add(tid)
+            ids[i] = tid
+
+        for tid in list(self.tracks):
+            if tid not in matched:
+                self.tracks[tid].missed += 1
+                if self.tracks[tid].missed > self.max_missed:
+                    del self.tracks[tid]
+
+        for i, box in enumerate(boxes):
+            if ids[i] is None:
+                ids[i] = self.next_id
+                self.tracks[self.next_id] = Track(self.next_id, box)
+                self.next_id += 1
+        return ids
+
+    def live(self):
+        # Some plate was matched in the latest detection
+        return any(t.missed == 0 for t in self.tracks.values())
+
+    def stable(self):
+        return any(t.missed == 0 and t.still >= self.stable_hits for t in self.tracks.values())
+
+
+def crop_fingerprint(crop):
+    # Difference hash of the downscaled grey crop: cheap and robust to
+    # small shifts and lighting changes between frames
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    w, h = FINGERPRINT_SIZE
+    small = cv2.resize(gray, (w + 1, h), interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1])
+
+
+def fingerprint_distance(a, b):
+    return np.unpackbits(a ^ b).sum() / (a.size * 8)
+
+
+class CacheEntry:
+    def __init__(self, fingerprint, pending_since=None):
+        self.fingerprint = fingerprint
+        self.text = None
+        self.agreed = 0  # consecutive OCR reads that returned `text`
+        self.read_at = None
+        self.pending_since = pending_since  # OCR queued but not back yet
+
+
+class OcrCache:
+    """Per-track OCR results, reused while the crop fingerprint stays close.
+
+    A track is only served from the cache once `confirm_reads` OCR reads
+    in a row agreed on its text; until then every new crop is read, so
+    one bad read can't be repeated into a majority. Confirmed entries
+    expire `max_age` seconds after they were read so a parked car is
+    re-read now and then; a pending read (OCR queued but not back yet)
+    is given up after `pending_ttl` in case its crop was dropped on the way.
+    """
+
+    def __init__(self, max_entries=64, max_age=10.0, max_distance=0.2, pending_ttl=1.0, confirm_reads=3):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.max_distance = max_distance
+        self.pending_ttl = pending_ttl
+        # As many agreeing reads as a PlateVoter needs to decide
+        self.confirm_reads = confirm_reads
+        self.entries = OrderedDict()  # track_id -> CacheEntry
+        self.lock = threading.Lock()
+
+    def _evict(self, now):
+        for tid, entry in list(self.entries.items()):
+            if entry.pending_since is not None and now - entry.pending_since > self.pending_ttl:
+                entry.pending_since = None
+            if entry.read_at is None:
+                if entry.pending_since is None:
+                    del self.entries[tid]
+            elif now - entry.read_at > self.max_age:
+                del self.entries[tid]
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def claim(self, track_id, fingerprint):
+        # Returns (needs_ocr, cached_text). A miss marks the track as
+        # pending so later frames don't queue the same plate again.
+        now = time.monotonic()
+        with self.lock:
+            self._evict(now)
+            entry = self.entries.get(track_id)
+            if entry is not None and fingerprint_distance(entry.fingerprint, fingerprint) <= self.max_distance:
+                self.entries.move_to_end(track_id)
+                if entry.pending_since is not None:
+                    return False, None
+                if entry.agreed >= self.confirm_reads:
+                    METRICS.inc("ocr_cache_hits")
+                    return False, entry.text
+                # Not confirmed yet: read this crop as well
+                entry.pending_since = now
+            else:
+                self.entries[track_id] = CacheEntry(fingerprint, now)
+                self._evict(now)
+            METRICS.inc("ocr_cache_misses")
+            return True, None
+
+    def store(self, track_id, fingerprint, text):
+        with self.lock:
+            entry = self.entries.get(track_id)
+            if entry is None:
+                entry = self.entries[track_id] = CacheEntry(fingerprint)
+            entry.pending_since = None
+            if not text:
+                # Unreadable crop: let the next frame try again
+                if entry.read_at is None:
+                    del self.entries[track_id]
+                return
+            if text == entry.text:
+                entry.agreed += 1
+            else:
+                entry.text, entry.agreed = text, 1
+            entry.fingerprint = fingerprint
+            entry.read_at = time.monotonic()
+            self.entries.move_to_end(track_id)